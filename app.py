@@ -10,27 +10,56 @@ UX Design Principles:
 - Instant gratification (immediate visual feedback for actions)
 - Error resilience (graceful degradation, helpful messages)
 
+Each step section is an st.fragment, so interacting with one step reruns
+only that step; steps call st.rerun() when they advance the workflow.
+Workflow execution runs on a background thread and a polling fragment
+redraws its progress, so the page stays responsive and can be stopped.
+
 Usage:
     streamlit run app.py
 """
 
 import streamlit as st
-import json
+import importlib
 import os
-from datetime import datetime
-from typing import List, Dict
-
-# Import core engine functions
-from sophia_prototype import (
-    load_env_config,
-    initialize_vector_store,
-    index_document,
-    generate_workflow,
-    execute_task,
-    save_output
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional, Tuple
+
+# Core engine is imported on first use by _load_core(), so the page
+# starts rendering before chromadb and friends are imported
+CORE_MODULE = "sophia_prototype"
+CORE_NAMES = (
+    'load_env_config',
+    'initialize_vector_store',
+    'index_document_file',
+    'generate_workflow',
+    'execute_task',
+    'condense_output',
+    'save_output',
+    'resolve_task_dependencies',
+    'build_execution_layers',
+    'compute_run_id',
+    'get_run_dir',
+    'save_run_manifest',
+    'load_run_manifest',
+    'prune_task_cache',
 )
 
 
+def _load_core():
+    """Import the core engine and bind the names used below."""
+    core = importlib.import_module(CORE_MODULE)
+    globals().update({name: getattr(core, name) for name in CORE_NAMES})
+
+
+# Fallback cap on concurrent LLM calls per workflow layer when
+# MAX_PARALLEL_TASKS is not set in .env
+MAX_PARALLEL_TASKS = 8
+
+
 # ============================================================================
 # PAGE CONFIGURATION
 # ============================================================================
@@ -43,6 +72,72 @@ st.set_page_config(
 )
 
 
+# ============================================================================
+# SHARED RESOURCES
+# ============================================================================
+
+@st.cache_resource(show_spinner=False)
+def _get_env_config() -> Dict:
+    """Load .env configuration once per server process."""
+    return load_env_config()
+
+
+@st.cache_resource(show_spinner=False)
+def _get_collection():
+    """Open the ChromaDB collection once and share it across sessions."""
+    return initialize_vector_store()
+
+
+# Characters shown in the document preview
+PREVIEW_CHARS = 4096
+
+
+def _truncate(text: str, limit: int) -> str:
+    """Cut text to limit characters plus an ellipsis; short text is returned as is."""
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def count_words(text: str) -> int:
+    """Count whitespace-delimited words; callers pass bounded blocks, not whole files."""
+    return len(text.split())
+
+
+def _spool_upload(uploaded_file) -> str:
+    """Copy an uploaded file to a temp path in 1 MB blocks and return the path."""
+    suffix = os.path.splitext(uploaded_file.name)[1] or '.txt'
+    uploaded_file.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        shutil.copyfileobj(uploaded_file, tmp, length=1 << 20)
+    return tmp.name
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _file_stats(path: str) -> Tuple[str, int, int, int]:
+    """Stream a spooled file once in blocks and return (preview, chars, words, lines)."""
+    n_chars = n_words = n_newlines = 0
+    preview = ""
+    ends_in_word = False
+    with open(path, 'r', encoding='utf-8') as f:
+        for block in iter(lambda: f.read(1 << 16), ''):
+            if len(preview) < PREVIEW_CHARS:
+                preview += block[:PREVIEW_CHARS - len(preview)]
+            n_chars += len(block)
+            n_newlines += block.count('\n')
+            n_words += count_words(block)
+            # A word straddling the block boundary was counted on both sides
+            if ends_in_word and not block[0].isspace():
+                n_words -= 1
+            ends_in_word = not block[-1].isspace()
+    return preview, n_chars, n_words, n_newlines + 1
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _read_output(path: str, mtime: float) -> bytes:
+    """Read an output file; mtime is part of the key so edits invalidate it."""
+    with open(path, 'rb') as f:
+        return f.read()
+
+
 # ============================================================================
 # SESSION STATE INITIALIZATION
 # ============================================================================
@@ -51,8 +146,6 @@ def init_session_state():
     """Initialize all session state variables."""
     if 'config' not in st.session_state:
         st.session_state.config = None
-    if 'collection' not in st.session_state:
-        st.session_state.collection = None
     if 'document_indexed' not in st.session_state:
         st.session_state.document_indexed = False
     if 'workflow' not in st.session_state:
@@ -63,6 +156,20 @@ def init_session_state():
         st.session_state.output_files = []
     if 'doc_name' not in st.session_state:
         st.session_state.doc_name = None
+    if 'doc_path' not in st.session_state:
+        st.session_state.doc_path = None
+    if 'doc_upload_id' not in st.session_state:
+        st.session_state.doc_upload_id = None
+    if 'workflow_run' not in st.session_state:
+        st.session_state.workflow_run = None
+    if 'run_id' not in st.session_state:
+        st.session_state.run_id = None
+    if 'manifest_run_id' not in st.session_state:
+        st.session_state.manifest_run_id = None
+    if 'cached_run' not in st.session_state:
+        st.session_state.cached_run = None
+    if 'model_display' not in st.session_state:
+        st.session_state.model_display = ''
 
 
 # ============================================================================
@@ -73,13 +180,10 @@ def initialize_system():
     """Initialize configuration and vector store (one-time setup)."""
     try:
         with st.spinner("Initializing Sophia..."):
-            # Load config
-            if st.session_state.config is None:
-                st.session_state.config = load_env_config()
-            
-            # Initialize vector store
-            if st.session_state.collection is None:
-                st.session_state.collection = initialize_vector_store()
+            # Config and vector store are shared across sessions
+            st.session_state.config = _get_env_config()
+            st.session_state.model_display = st.session_state.config['model'].rsplit('/', 1)[-1]
+            _get_collection()
         
         return True
     except Exception as e:
@@ -102,35 +206,43 @@ def render_header():
     
     with col2:
         if st.session_state.config:
-            model_name = st.session_state.config['model'].split('/')[-1]
-            st.info(f"🧠 Model: {model_name}")
+            st.info(f"🧠 Model: {st.session_state.model_display}")
 
 
+SIDEBAR_STEPS = (
+    "📄 Document Upload",
+    "🔍 Document Indexed",
+    "🗺️ Workflow Generated",
+    "✅ Workflow Executed"
+)
+
+
+@st.fragment
 def render_sidebar_status():
-    """Render workflow status in sidebar."""
-    st.sidebar.header("📊 Workflow Status")
+    """Render workflow status; call inside `with st.sidebar:`."""
+    st.header("📊 Workflow Status")
     
     # Progress tracking
-    steps = [
-        ("📄 Document Upload", st.session_state.doc_name is not None),
-        ("🔍 Document Indexed", st.session_state.document_indexed),
-        ("🗺️ Workflow Generated", st.session_state.workflow is not None),
-        ("✅ Workflow Executed", st.session_state.workflow_executed)
-    ]
-    
-    for step_name, completed in steps:
+    completed_steps = (
+        st.session_state.doc_name is not None,
+        st.session_state.document_indexed,
+        st.session_state.workflow is not None,
+        st.session_state.workflow_executed
+    )
+    
+    for name, completed in zip(SIDEBAR_STEPS, completed_steps):
         if completed:
-            st.sidebar.success(f"✓ {step_name}")
+            st.success(f"✓ {name}")
         else:
-            st.sidebar.info(f"○ {step_name}")
+            st.info(f"○ {name}")
     
     # Stats
     if st.session_state.workflow:
-        st.sidebar.divider()
-        st.sidebar.metric("Tasks in Workflow", len(st.session_state.workflow['tasks']))
+        st.divider()
+        st.metric("Tasks in Workflow", len(st.session_state.workflow['tasks']))
     
     if st.session_state.output_files:
-        st.sidebar.metric("Output Files", len(st.session_state.output_files))
+        st.metric("Output Files", len(st.session_state.output_files))
 
 
 def render_file_upload():
@@ -144,33 +256,42 @@ def render_file_upload():
     )
     
     if uploaded_file is not None:
-        # Read file content
-        content = uploaded_file.read().decode('utf-8')
+        # Spool to disk once per upload; only a preview stays in memory
+        if st.session_state.doc_upload_id != uploaded_file.file_id:
+            _discard_spooled_doc()
+            st.session_state.doc_path = _spool_upload(uploaded_file)
+            st.session_state.doc_upload_id = uploaded_file.file_id
+        
+        preview, n_chars, n_words, n_lines = _file_stats(st.session_state.doc_path)
         
         # Display preview
         with st.expander("📄 Document Preview", expanded=False):
-            st.text_area(
-                "Content",
-                content,
-                height=200,
-                disabled=True
-            )
+            st.code(preview + ("..." if n_chars > len(preview) else ""), language=None)
         
         # Show file stats
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("File Size", f"{len(content)} chars")
+            st.metric("File Size", f"{n_chars} chars")
         with col2:
-            st.metric("Word Count", len(content.split()))
+            st.metric("Word Count", n_words)
         with col3:
-            st.metric("Lines", len(content.split('\n')))
+            st.metric("Lines", n_lines)
         
-        return content, uploaded_file.name
+        return st.session_state.doc_path, uploaded_file.name
     
     return None, None
 
 
-def render_indexing_section(content: str, doc_name: str):
+def _discard_spooled_doc():
+    """Delete the spooled upload, if any."""
+    if st.session_state.doc_path and os.path.exists(st.session_state.doc_path):
+        os.remove(st.session_state.doc_path)
+    st.session_state.doc_path = None
+    st.session_state.doc_upload_id = None
+
+
+@st.fragment
+def render_indexing_section(doc_path: str, doc_name: str):
     """Render document indexing section."""
     st.header("🔍 Step 2: Index Document")
     
@@ -181,9 +302,9 @@ def render_indexing_section(content: str, doc_name: str):
             try:
                 # Index the document
                 st.write("🔨 Splitting document into chunks...")
-                result = index_document(
-                    st.session_state.collection,
-                    content,
+                result = index_document_file(
+                    _get_collection(),
+                    doc_path,
                     doc_name
                 )
                 
@@ -194,13 +315,18 @@ def render_indexing_section(content: str, doc_name: str):
                 st.session_state.doc_name = doc_name
                 
                 status.update(label="✅ Document indexed successfully!", state="complete")
-                st.balloons()
                 
             except Exception as e:
                 status.update(label="❌ Indexing failed", state="error")
                 st.error(f"Error: {str(e)}")
+                return
+        
+        # Fragment reruns stop here; rerun the app to reveal the next step
+        st.toast("✅ Document indexed successfully!", icon="🎉")
+        st.rerun()
 
 
+@st.fragment
 def render_workflow_generation():
     """Render workflow generation section."""
     st.header("🗺️ Step 3: Generate Workflow")
@@ -215,22 +341,26 @@ def render_workflow_generation():
                 
                 # Generate workflow
                 workflow = generate_workflow(
-                    st.session_state.collection,
+                    _get_collection(),
                     st.session_state.config['api_key'],
                     st.session_state.config['model']
                 )
                 
                 st.write(f"✅ Generated {len(workflow['tasks'])} tasks")
                 
-                # Update state
+                # Update state; the run id hashes the spec, so compute it once here
                 st.session_state.workflow = workflow
+                st.session_state.run_id = _compute_run_id(workflow)
                 
                 status.update(label="✅ Workflow generated successfully!", state="complete")
-                st.success(f"🎉 Created workflow: **{workflow['workflow_name']}**")
                 
             except Exception as e:
                 status.update(label="❌ Generation failed", state="error")
                 st.error(f"Error: {str(e)}")
+                return
+        
+        st.toast(f"🎉 Created workflow: {workflow['workflow_name']}")
+        st.rerun()
 
 
 def render_workflow_display():
@@ -250,94 +380,225 @@ def render_workflow_display():
                 st.markdown(f"**Task ID:** {task['task_id']}")
                 st.markdown(f"**Output Format:** {task['output_format']}")
                 st.markdown("**Prompt:**")
-                st.text_area(
-                    "Prompt",
-                    task['prompt'],
-                    height=100,
-                    key=f"task_prompt_{i}",
-                    disabled=True,
-                    label_visibility="collapsed"
-                )
+                st.code(task['prompt'], language=None)
         
         # JSON view
         with st.expander("🔧 View Raw JSON", expanded=False):
             st.json(workflow)
 
 
-def render_workflow_execution():
-    """Render workflow execution section."""
-    st.header("⚡ Step 4: Execute Workflow")
+def _execute_and_condense(task: Dict, collection, api_key: str, model: str,
+                          previous_outputs: List[str], condense: bool) -> Tuple[str, Optional[str]]:
+    """Run one task and, if a later task reads it, condense its output on the same worker thread."""
+    result = execute_task(
+        task=task,
+        collection=collection,
+        api_key=api_key,
+        model=model,
+        previous_outputs=previous_outputs
+    )
+    return result, (condense_output(result, api_key, model) if condense else None)
+
+
+def _run_workflow(run: Dict, tasks: List[Dict], collection, api_key: str, model: str,
+                  output_dir: str, max_workers: int):
+    """
+    Execute workflow tasks on a background thread.
     
-    st.info(f"🎯 This will execute all {len(st.session_state.workflow['tasks'])} tasks sequentially with cumulative context.")
+    Never touches st.* APIs; progress is published into the run dict under
+    run['lock'] and the cancel flag is checked between dependency layers.
+    """
+    dependencies = resolve_task_dependencies(tasks)
+    # Only outputs some later task depends on are worth a summary call
+    consumed = {dep for deps in dependencies for dep in deps}
+    outputs_by_index = {}
     
-    if st.button("🚀 Execute Workflow", type="primary", use_container_width=True):
-        workflow = st.session_state.workflow
-        output_files = []
-        previous_outputs = []
-        
-        # Progress tracking
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        total_tasks = len(workflow['tasks'])
-        
-        for i, task in enumerate(workflow['tasks'], 1):
-            # Update progress
-            progress = i / total_tasks
-            progress_bar.progress(progress)
-            status_text.text(f"Executing task {i}/{total_tasks}: {task['name']}...")
+    try:
+        for layer in build_execution_layers(tasks):
+            if run['cancel'].is_set():
+                break
+            
+            with run['lock']:
+                run['running'] = [tasks[idx]['name'] for idx in layer]
             
-            # Create expandable section for task execution
-            with st.expander(f"Task {i}: {task['name']}", expanded=True):
-                with st.spinner("Processing..."):
+            # Tasks within a layer are independent, so run them concurrently
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(layer))) as executor:
+                futures = {
+                    executor.submit(
+                        _execute_and_condense,
+                        task=tasks[idx],
+                        collection=collection,
+                        api_key=api_key,
+                        model=model,
+                        previous_outputs=[
+                            outputs_by_index[dep] for dep in dependencies[idx]
+                            if dep in outputs_by_index
+                        ],
+                        condense=idx in consumed
+                    ): idx
+                    for idx in layer
+                }
+                
+                for future in as_completed(futures):
+                    idx = futures[future]
+                    task = tasks[idx]
+                    entry = {'index': idx, 'name': task['name']}
+                    
                     try:
-                        # Execute task
-                        result = execute_task(
-                            task=task,
-                            collection=st.session_state.collection,
-                            api_key=st.session_state.config['api_key'],
-                            model=st.session_state.config['model'],
-                            previous_outputs=previous_outputs
-                        )
+                        # Summaries were made in the worker, so slow ones
+                        # do not hold up the rest of the layer here
+                        result, condensed = future.result()
                         
                         # Save output
-                        output_path = save_output(
+                        entry['output_path'] = save_output(
                             content=result,
                             task_name=task['name'],
-                            output_format=task['output_format']
-                        )
-                        
-                        output_files.append(output_path)
-                        previous_outputs.append(f"[Task {task['task_id']}: {task['name']}]\n{result}")
-                        
-                        # Display result preview
-                        st.success(f"✅ Completed! Saved to: `{output_path}`")
-                        
-                        # Show preview
-                        preview_length = min(500, len(result))
-                        st.text_area(
-                            "Preview",
-                            result[:preview_length] + ("..." if len(result) > preview_length else ""),
-                            height=150,
-                            key=f"result_preview_{i}",
-                            disabled=True,
-                            label_visibility="collapsed"
+                            output_format=task['output_format'],
+                            output_dir=output_dir
                         )
+                        if condensed is not None:
+                            outputs_by_index[idx] = f"[Task {task['task_id']}: {task['name']}]\n{condensed}"
                         
+                        entry['preview'] = _truncate(result, 500)
                     except Exception as e:
-                        st.error(f"❌ Task failed: {str(e)}")
+                        entry['error'] = str(e)
+                    
+                    with run['lock']:
+                        run['results'].append(entry)
+    finally:
+        with run['lock']:
+            run['running'] = []
+            run['done'] = True
+
+
+def _start_workflow_run(workflow: Dict, run_id: Optional[str]) -> Dict:
+    """Launch the workflow on a daemon thread and return its shared run state."""
+    run = {
+        'run_id': run_id,
+        'lock': threading.Lock(),
+        'cancel': threading.Event(),
+        'total': len(workflow['tasks']),
+        'running': [],
+        'results': [],
+        'done': False
+    }
+    
+    # Snapshot session values; session_state is only valid on the script thread
+    threading.Thread(
+        target=_run_workflow,
+        args=(
+            run,
+            workflow['tasks'],
+            _get_collection(),
+            st.session_state.config['api_key'],
+            st.session_state.config['model'],
+            get_run_dir(run_id) if run_id else "outputs",
+            st.session_state.config.get('max_parallel_tasks') or MAX_PARALLEL_TASKS
+        ),
+        daemon=True
+    ).start()
+    
+    return run
+
+
+def _compute_run_id(workflow: Dict) -> Optional[str]:
+    """Run id for the spooled spec + workflow + model, or None without a spec."""
+    if st.session_state.doc_path and os.path.exists(st.session_state.doc_path):
+        return compute_run_id(
+            st.session_state.doc_path,
+            workflow,
+            st.session_state.config['model']
+        )
+    return None
+
+
+def render_workflow_execution():
+    """Render workflow execution section."""
+    st.header("⚡ Step 4: Execute Workflow")
+    
+    if st.session_state.workflow_run is None:
+        # Same spec + workflow + model as a completed run? Reuse its outputs.
+        # run.json is only re-read when the run id changes.
+        run_id = st.session_state.run_id
+        if st.session_state.manifest_run_id != run_id:
+            st.session_state.cached_run = load_run_manifest(run_id) if run_id else None
+            st.session_state.manifest_run_id = run_id
+        cached_run = st.session_state.cached_run
         
-        # Update final state
-        progress_bar.progress(1.0)
-        status_text.text("✅ All tasks completed!")
+        if cached_run:
+            st.info(f"♻️ An identical run already exists - its {len(cached_run['output_files'])} outputs will be reused.")
+        else:
+            st.info(f"🎯 This will execute all {len(st.session_state.workflow['tasks'])} tasks with cumulative context, running independent tasks in parallel.")
+        
+        # Only the submit button can trigger a rerun from this step
+        with st.form("exec_form", clear_on_submit=False, border=False):
+            submitted = st.form_submit_button("🚀 Execute Workflow", type="primary", use_container_width=True)
         
+        if submitted:
+            if cached_run:
+                st.session_state.output_files = cached_run['output_files']
+                st.session_state.workflow_executed = True
+            else:
+                st.session_state.workflow_run = _start_workflow_run(st.session_state.workflow, run_id)
+            st.rerun()
+        return
+    
+    render_workflow_progress()
+
+
+@st.fragment(run_every=1)
+def render_workflow_progress():
+    """Poll the background run and redraw progress without blocking the page."""
+    run = st.session_state.workflow_run
+    if run is None:
+        return
+    
+    with run['lock']:
+        results = list(run['results'])
+        running = list(run['running'])
+        done = run['done']
+    
+    # Progress tracking
+    st.progress(len(results) / run['total'])
+    if done:
+        st.text("✅ All tasks completed!")
+    elif run['cancel'].is_set():
+        st.text("⏹️ Stopping after the current task(s)...")
+    else:
+        st.text(f"Executing {len(running)} task(s): {', '.join(running)}...")
+        if st.button("⏹️ Stop", key="stop_workflow"):
+            run['cancel'].set()
+    
+    # One placeholder per task keeps workflow order and is filled in place
+    slots = [st.empty() for _ in range(run['total'])]
+    
+    for entry in results:
+        i = entry['index'] + 1
+        with slots[entry['index']].container():
+            with st.expander(f"Task {i}: {entry['name']}", expanded=True):
+                if 'error' in entry:
+                    st.error(f"❌ Task failed: {entry['error']}")
+                else:
+                    st.success(f"✅ Completed! Saved to: `{entry['output_path']}`")
+                    st.code(entry['preview'], language=None)
+    
+    if done:
+        # Update final state
+        output_files = [entry['output_path'] for entry in results if 'output_path' in entry]
         st.session_state.output_files = output_files
+        
+        # Only complete, error-free runs are eligible for reuse
+        if run['run_id'] and len(output_files) == run['total']:
+            save_run_manifest(run['run_id'], st.session_state.workflow, output_files)
+            st.session_state.manifest_run_id = None  # Re-read the new manifest
         st.session_state.workflow_executed = True
+        st.session_state.workflow_run = None
         
-        st.balloons()
-        st.success(f"🎉 Workflow complete! Generated {len(output_files)} output files.")
+        st.toast(f"🎉 Workflow complete! Generated {len(output_files)} output files.")
+        st.rerun()
 
 
+@st.fragment
 def render_output_downloads():
     """Render download section for output files."""
     if st.session_state.output_files:
@@ -352,9 +613,8 @@ def render_output_downloads():
             col = cols[i % 2]
             
             with col:
-                # Read file content
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
+                # Read file content (cached until the file changes)
+                content = _read_output(filepath, os.path.getmtime(filepath))
                 
                 # Extract filename
                 filename = os.path.basename(filepath)
@@ -369,20 +629,55 @@ def render_output_downloads():
                 )
 
 
+# Per-workflow session keys; init_session_state() restores their defaults
+RESET_KEYS = (
+    'document_indexed',
+    'workflow',
+    'workflow_executed',
+    'output_files',
+    'doc_name',
+    'workflow_run',
+    'run_id',
+    'manifest_run_id',
+    'cached_run'
+)
+
+# Task cache entries older than this are pruned on reset
+TASK_CACHE_MAX_AGE_DAYS = 7
+
+
 def render_reset_button():
     """Render reset workflow button."""
     if st.session_state.workflow_executed:
         st.divider()
         if st.button("🔄 Start New Workflow", type="secondary", use_container_width=True):
+            # Drop on-disk artifacts of the finished workflow; the cache_data
+            # entries are shared by all sessions, so they are left to expire
+            _discard_spooled_doc()
+            prune_task_cache(TASK_CACHE_MAX_AGE_DAYS)
+            
             # Reset state
-            st.session_state.document_indexed = False
-            st.session_state.workflow = None
-            st.session_state.workflow_executed = False
-            st.session_state.output_files = []
-            st.session_state.doc_name = None
+            for key in RESET_KEYS:
+                del st.session_state[key]
+            
             st.rerun()
 
 
+# Static footer markup
+FOOTER_HTML = """
+        <div style='text-align: center; color: #666; padding: 20px;'>
+            <p>🤖 Sophia Prototype v1.0 | Powered by AI</p>
+        </div>
+    """
+
+
+@st.fragment
+def render_footer():
+    """Render the static footer in its own fragment."""
+    st.divider()
+    st.markdown(FOOTER_HTML, unsafe_allow_html=True)
+
+
 # ============================================================================
 # MAIN APPLICATION
 # ============================================================================
@@ -392,6 +687,10 @@ def main():
     # Initialize session state
     init_session_state()
     
+    # Import the core engine (cheap after the first run: cached in sys.modules)
+    with st.spinner("Loading Sophia engine..."):
+        _load_core()
+    
     # Initialize system
     if not initialize_system():
         st.stop()
@@ -400,21 +699,22 @@ def main():
     render_header()
     
     # Render sidebar status
-    render_sidebar_status()
+    with st.sidebar:
+        render_sidebar_status()
     
     st.divider()
     
     # Main workflow steps
     
     # Step 1: File Upload
-    content, doc_name = render_file_upload()
+    doc_path, doc_name = render_file_upload()
     
-    if content and doc_name:
+    if doc_path and doc_name:
         st.divider()
         
         # Step 2: Indexing
         if not st.session_state.document_indexed:
-            render_indexing_section(content, doc_name)
+            render_indexing_section(doc_path, doc_name)
         else:
             st.success(f"✅ Document '{doc_name}' is indexed and ready")
     
@@ -443,15 +743,7 @@ def main():
         render_reset_button()
     
     # Footer
-    st.divider()
-    st.markdown(
-        """
-        <div style='text-align: center; color: #666; padding: 20px;'>
-            <p>🤖 Sophia Prototype v1.0 | Powered by AI</p>
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+    render_footer()
 
 
 if __name__ == "__main__":
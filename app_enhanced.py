@@ -17,31 +17,52 @@ Usage:
 """
 
 import streamlit as st
+import hashlib
+import importlib
+import io
 import json
 import os
+import tempfile
+import threading
+import zipfile
 from datetime import datetime
-from typing import List, Dict, Optional
-
-# Import enhanced core functions
-from sophia_enhanced import (
-    load_env_config,
-    initialize_vector_store,
-    validate_text_input,
-    index_document,
-    generate_workflow_from_ai,
-    generate_workflow_from_ai_with_goal,
-    generate_workflow_from_template,
-    execute_task_safe,
-    save_output,
-    save_workflow_history,
-    list_workflow_history,
-    ConfigurationError,
-    VectorStoreError,
-    AIError
+from typing import List, Dict, Optional, Tuple
+
+# Core engine and templates are imported on first use by _load_core(), so
+# the page starts rendering before chromadb and friends are imported
+CORE_MODULE = "sophia_enhanced"
+CORE_NAMES = (
+    'load_env_config',
+    'initialize_vector_store',
+    'validate_text_input',
+    'validate_text_file',
+    'batch_index_files',
+    'remove_documents',
+    'generate_workflow_from_ai',
+    'generate_workflow_from_ai_with_goal',
+    'generate_workflow_from_template',
+    'execute_task_safe',
+    'run_workflow_tasks',
+    'critical_path_length',
+    'TaskResult',
+    'save_output',
+    'save_workflow_history',
+    'list_workflow_history',
+    'count_workflow_history',
+    'ConfigurationError',
+    'VectorStoreError',
+    'AIError',
 )
+TEMPLATE_NAMES = ('list_templates', 'suggest_template_for_file')
+
 
-# Import template functions
-from templates import list_templates, suggest_template
+def _load_core():
+    """Import the core engine and templates and bind the names used below."""
+    core = importlib.import_module(CORE_MODULE)
+    globals().update({name: getattr(core, name) for name in CORE_NAMES})
+    
+    templates = importlib.import_module("templates")
+    globals().update({name: getattr(templates, name) for name in TEMPLATE_NAMES})
 
 
 # ============================================================================
@@ -56,6 +77,151 @@ st.set_page_config(
 )
 
 
+# ============================================================================
+# SHARED RESOURCES
+# ============================================================================
+
+@st.cache_resource(show_spinner=False)
+def _get_env_config() -> Dict:
+    """Load .env configuration once per server process."""
+    return load_env_config()
+
+
+@st.cache_resource(show_spinner=False)
+def _get_collection():
+    """Open the ChromaDB collection once and share it across sessions."""
+    return initialize_vector_store()
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _template_index() -> Tuple[List[Dict], Dict[str, str], Dict[str, Dict]]:
+    """
+    Template metadata with its lookups prebuilt; templates are static.
+    
+    Returns:
+        Tuple of (templates, {name: id}, {id: template})
+    """
+    templates = list_templates()
+    return (
+        templates,
+        {t['name']: t['id'] for t in templates},
+        {t['id']: t for t in templates}
+    )
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _suggest_template_cached(content_hash: str, _path: str) -> str:
+    """Suggest a template once per distinct upload content (_path is not hashed)."""
+    return suggest_template_for_file(_path)
+
+
+# Entries listed in the sidebar history
+HISTORY_PREVIEW_COUNT = 5
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _workflow_history_summary() -> Tuple[int, List[Dict]]:
+    """
+    (total count, newest entries) of the saved workflow history.
+    
+    Only the previewed entries are parsed; cleared whenever a new entry is written.
+    """
+    return count_workflow_history(), list_workflow_history(limit=HISTORY_PREVIEW_COUNT)
+
+
+def _truncate(text: str, limit: int) -> str:
+    """Cut text to limit characters plus an ellipsis; short text is returned as is."""
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def count_words(text: str) -> int:
+    """Count whitespace-delimited words; callers pass bounded blocks, not whole files."""
+    return len(text.split())
+
+
+PREVIEW_CHARS = 500
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _read_output(path: str, mtime: float) -> bytes:
+    """Read an output file; mtime is part of the key so edits invalidate it."""
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _build_zip_bytes(paths: Tuple[str, ...], mtimes: Tuple[float, ...]) -> bytes:
+    """Zip output files; mtimes are part of the key so edits invalidate it."""
+    buf = io.BytesIO()
+    # Outputs are text, so the fastest deflate level already compresses well
+    with zipfile.ZipFile(buf, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        for path in paths:
+            zf.write(path, arcname=os.path.basename(path))
+    return buf.getvalue()
+
+
+def _spool_upload(uploaded_file) -> Tuple[str, str]:
+    """
+    Copy an uploaded file to a temp path in 1 MB blocks.
+    
+    The BLAKE2b content digest, used to spot re-uploaded content, is computed
+    over the same blocks so the file is only read once.
+    
+    Returns:
+        Tuple of (path, hex digest)
+    """
+    suffix = os.path.splitext(uploaded_file.name)[1] or '.txt'
+    digest = hashlib.blake2b(digest_size=16)
+    uploaded_file.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        for block in iter(lambda: uploaded_file.read(1 << 20), b''):
+            digest.update(block)
+            tmp.write(block)
+    return tmp.name, digest.hexdigest()
+
+
+def _discard_spooled(paths: List[str]):
+    """Delete spooled upload files and forget their upload ids."""
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    
+    paths = set(paths)
+    st.session_state.upload_paths = {
+        file_id: path for file_id, path in st.session_state.upload_paths.items()
+        if path not in paths
+    }
+    st.session_state.upload_hashes = {
+        path: digest for path, digest in st.session_state.upload_hashes.items()
+        if path not in paths
+    }
+    
+    # Force the next upload scan to re-spool anything still uploaded
+    st.session_state.upload_sig = None
+
+
+@st.cache_data(show_spinner=False)
+def _file_stats(path: str) -> Tuple[str, int, int, int]:
+    """Stream a spooled file once in blocks and return (preview, chars, words, lines)."""
+    n_chars = n_words = n_newlines = 0
+    preview = ""
+    ends_in_word = False
+    with open(path, 'r', encoding='utf-8') as f:
+        for block in iter(lambda: f.read(1 << 16), ''):
+            if len(preview) < PREVIEW_CHARS:
+                preview += block[:PREVIEW_CHARS - len(preview)]
+            n_chars += len(block)
+            n_newlines += block.count('\n')
+            n_words += count_words(block)
+            # A word straddling the block boundary was counted on both sides
+            if ends_in_word and not block[0].isspace():
+                n_words -= 1
+            ends_in_word = not block[-1].isspace()
+    return preview, n_chars, n_words, n_newlines + 1
+
+
 # ============================================================================
 # SESSION STATE
 # ============================================================================
@@ -64,14 +230,18 @@ def init_session_state():
     """Initialize all session state variables."""
     defaults = {
         'config': None,
-        'collection': None,
         'user_api_key': '',
         'user_model': '',
+        'model_display': '',
+        'max_parallel_tasks': None,  # From .env; None means the engine default
         'api_configured': False,
         'document_indexed': False,
         'doc_name': None,
-        'doc_content': None,
         'workflow': None,
+        'workflow_json': '',  # Export/display JSON, serialized once per workflow
+        'workflow_stamp': '',  # Generation time, used in export file names
+        'task_rows': [],  # Task table rows (with complexity labels), built once per workflow
+        'workflow_depth': 0,  # Tasks on the longest dependency chain
         'workflow_executed': False,
         'output_files': [],
         'execution_errors': [],
@@ -80,18 +250,29 @@ def init_session_state():
         'suggested_template': None,
         'ai_generation_in_progress': False,
         'ai_generation_status': '',
+        'ai_generation_run': None,  # Shared state of the background AI generation
+        'ai_generation_error': None,  # (title, message, hint) from the last failed run
         'workflow_target': '',
+        'ai_use_cache': True,  # Reuse a cached workflow for a similar goal
         'generation_complete': False,
-        'indexed_files': [],  # List of dicts: [{name, chunks, timestamp}, ...]
+        'rendered_stage': None,  # _page_stage() as of the start of this script run
+        'indexed_files': [],  # List of dicts: [{name, chunks, timestamp, hash}, ...]
+        'indexed_names': set(),  # Names in indexed_files, for O(1) membership tests
+        'indexed_hashes': {},  # Content hash -> name for hashed entries of indexed_files
         'total_chunks_indexed': 0,
-        'pending_files': [],  # Files uploaded but not yet indexed
-        'failed_tasks': [],  # List of dicts: [{task_index, task, error}, ...]
-        'task_outputs': {}  #dict: {taksk_index, output_content}
+        'pending_files': [],  # Files uploaded but not yet indexed: [{name, path, size, hash}, ...]
+        'upload_paths': {},  # Spooled upload paths by uploader file_id
+        'upload_hashes': {},  # Content digest by spooled upload path
+        'upload_sig': None,  # (upload ids/sizes, indexed count) of the last upload scan
+        'upload_scan': [],  # Per-file results of the last upload scan
+        'task_results': [],  # One TaskResult (or None until it runs) per workflow task
+        'workflow_run': None  # Shared state of the background workflow execution
     }
     
-    for key, value in defaults.items():
-        if key not in st.session_state:
-            st.session_state[key] = value
+    # One bulk write for whatever is missing; a no-op on later reruns
+    missing = defaults.keys() - st.session_state.keys()
+    if missing:
+        st.session_state.update({key: defaults[key] for key in missing})
 
 
 # ============================================================================
@@ -104,29 +285,33 @@ def initialize_system():
         with st.spinner("Initializing Sophia..."):
             # Try loading from .env first (for defaults)
             try:
-                env_config = load_env_config()
+                env_config = _get_env_config()
                 if not st.session_state.user_api_key:
                     st.session_state.user_api_key = env_config['api_key']
                 if not st.session_state.user_model:
                     st.session_state.user_model = env_config['model']
+                st.session_state.max_parallel_tasks = env_config['max_parallel_tasks']
             except ConfigurationError:
                 # .env not found or invalid - that's okay, user will input
                 pass
             
-            # Use user-provided values if available
-            if st.session_state.user_api_key and st.session_state.user_model:
+            # Build the session config once; later changes go through "Save Configuration"
+            if (st.session_state.config is None
+                    and st.session_state.user_api_key and st.session_state.user_model):
                 st.session_state.config = {
                     'api_key': st.session_state.user_api_key,
                     'model': st.session_state.user_model,
                     'max_retries': 3,
                     'timeout': 60,
                     'chunk_size': 800,
-                    'chunk_overlap': 200
+                    'chunk_overlap': 200,
+                    'max_parallel_tasks': st.session_state.max_parallel_tasks
                 }
+                st.session_state.model_display = st.session_state.user_model.rsplit('/', 1)[-1]
                 st.session_state.api_configured = True
             
-            if st.session_state.collection is None:
-                st.session_state.collection = initialize_vector_store()
+            # Open (or reuse) the shared collection so errors surface here
+            _get_collection()
         
         return True, None
         
@@ -171,8 +356,7 @@ def render_header():
     
     with col2:
         if st.session_state.config:
-            model_name = st.session_state.config['model'].split('/')[-1]
-            st.info(f"🧠 {model_name}")
+            st.info(f"🧠 {st.session_state.model_display}")
     
     with col3:
         st.info("📦 v1.0 (Stage 3)")
@@ -191,7 +375,7 @@ def render_api_configuration():
         with col3:
             if st.button("Change", use_container_width=True):
                 st.session_state.api_configured = False
-                st.rerun()
+                maybe_rerun()
     else:
         col1, col2 = st.columns([2, 1])
         
@@ -247,83 +431,171 @@ def render_api_configuration():
                         'max_retries': 3,
                         'timeout': 60,
                         'chunk_size': 800,
-                        'chunk_overlap': 200
+                        'chunk_overlap': 200,
+                        'max_parallel_tasks': st.session_state.max_parallel_tasks
                     }
+                    st.session_state.model_display = model_input.rsplit('/', 1)[-1]
                     st.session_state.api_configured = True
                     st.success("✅ Configuration saved!")
-                    st.rerun()
+                    maybe_rerun()
         else:
             st.warning("Please provide both API key and model name to continue")
 
+def render_indexed_files_table():
+    """Indexed files as one table element instead of several elements per file."""
+    st.dataframe(
+        [
+            {"File": f['name'], "Chunks": f['chunks'], "Indexed": f['timestamp']}
+            for f in st.session_state.indexed_files
+        ],
+        hide_index=True,
+        use_container_width=True
+    )
+
+
+@st.fragment
 def render_sidebar():
-    """Enhanced sidebar with history and templates."""
-    with st.sidebar.expander("Debug Info", expanded=False):
-        st.write("Pending files:", len(st.session_state.pending_files))
-        st.write("Indexed files:", len(st.session_state.indexed_files))
-        st.write("AI in progress:", st.session_state.ai_generation_in_progress)
-        st.write("Generation complete:", st.session_state.generation_complete)
-        st.write("Workflow exists:", st.session_state.workflow is not None)
-        st.sidebar.header("Progress")
+    """Enhanced sidebar with history and templates; call inside `with st.sidebar:`."""
+    # Read each session value once instead of going through the proxy per use
+    ss = st.session_state
+    indexed_files = ss.indexed_files
+    workflow = ss.workflow
+    output_files = ss.output_files
+    execution_errors = ss.execution_errors
+    
+    with st.expander("Debug Info", expanded=False):
+        st.write("Pending files:", len(ss.pending_files))
+        st.write("Indexed files:", len(indexed_files))
+        st.write("AI in progress:", ss.ai_generation_in_progress)
+        st.write("Generation complete:", ss.generation_complete)
+        st.write("Workflow exists:", workflow is not None)
+    
+    st.header("Progress")
     
     # Progress tracking
     steps = [
-        ("📄 Files Uploaded", len(st.session_state.indexed_files) > 0),
-        ("🔍 Files Indexed", st.session_state.document_indexed),
-        ("🗺️ Workflow Generated", st.session_state.workflow is not None),
-        ("✅ Workflow Executed", st.session_state.workflow_executed)
+        ("📄 Files Uploaded", len(indexed_files) > 0),
+        ("🔍 Files Indexed", ss.document_indexed),
+        ("🗺️ Workflow Generated", workflow is not None),
+        ("✅ Workflow Executed", ss.workflow_executed)
     ]
 
     for step_name, completed in steps:
         if completed:
-            st.sidebar.success(f"✓ {step_name}")
+            st.success(f"✓ {step_name}")
         else:
-            st.sidebar.info(f"○ {step_name}")
+            st.info(f"○ {step_name}")
     
     # Stats
-    if st.session_state.indexed_files:
-        st.sidebar.divider()
-        st.sidebar.metric("Files Indexed", len(st.session_state.indexed_files))
-        st.sidebar.metric("Total Chunks", st.session_state.total_chunks_indexed)
+    if indexed_files:
+        st.divider()
+        st.metric("Files Indexed", len(indexed_files))
+        st.metric("Total Chunks", ss.total_chunks_indexed)
     
-    if st.session_state.workflow:
-        st.sidebar.metric("Workflow Tasks", len(st.session_state.workflow['tasks']))
+    if workflow:
+        st.metric("Workflow Tasks", len(workflow['tasks']))
     
-    if st.session_state.output_files:
-        st.sidebar.metric("Output Files", len(st.session_state.output_files))
+    if output_files:
+        st.metric("Output Files", len(output_files))
     
-    if st.session_state.execution_errors:
-        st.sidebar.metric("Errors", len(st.session_state.execution_errors))
+    if execution_errors:
+        st.metric("Errors", len(execution_errors))
     
     # Indexed Files List
-    if st.session_state.indexed_files:
-        st.sidebar.divider()
-        st.sidebar.header("📚 Indexed Files")
+    if indexed_files:
+        st.divider()
+        st.header("📚 Indexed Files")
         
-        for idx, file_info in enumerate(st.session_state.indexed_files, 1):
-            with st.sidebar.expander(f"📄 {file_info['name']}", expanded=False):
-                st.caption(f"🧩 Chunks: {file_info['chunks']}")
-                st.caption(f"⏰ Indexed: {file_info['timestamp']}")
+        render_indexed_files_table()
     
     # Workflow History
     if 'SPACE_ID' not in os.environ:
-        st.sidebar.divider()
-        st.sidebar.header("📚 History")
+        st.divider()
+        st.header("📚 History")
         
-        history = list_workflow_history()
+        history_count, history = _workflow_history_summary()
         if history:
-            st.sidebar.caption(f"Found {len(history)} previous workflows")
+            st.caption(f"Found {history_count} previous workflows")
             
-            with st.sidebar.expander("View History", expanded=False):
-                for item in history[:5]:
-                    st.caption(f"**{item['workflow_name']}**")
-                    st.caption(f"⏰ {item['timestamp']}")
-                    st.caption(f"📝 {item['num_tasks']} tasks")
-                    st.divider()
+            with st.expander("View History", expanded=False):
+                # One table element instead of four elements per entry
+                st.dataframe(
+                    [
+                        {"Workflow": item['workflow_name'], "Run": item['timestamp'], "Tasks": item['num_tasks']}
+                        for item in history
+                    ],
+                    hide_index=True,
+                    use_container_width=True
+                )
         else:
-            st.sidebar.caption("No history yet")
+            st.caption("No history yet")
     else:
-        st.sidebar.divider()
-        st.sidebar.info("💡 History disabled on Spaces")
+        st.divider()
+        st.info("💡 History disabled on Spaces")
+
+
+def _record_indexed(entries: List[Dict]):
+    """Append newly indexed files, keeping the lookup companions and chunk total in step."""
+    st.session_state.indexed_files.extend(entries)
+    for entry in entries:
+        st.session_state.indexed_names.add(entry['name'])
+        if entry.get('hash'):
+            st.session_state.indexed_hashes[entry['hash']] = entry['name']
+    st.session_state.total_chunks_indexed += sum(entry['chunks'] for entry in entries)
+
+
+def _scan_uploads(uploaded_files) -> List[Dict]:
+    """
+    Spool, validate, hash and measure uploads that are not indexed yet.
+    
+    Returns one entry per new file: {name, path, error, duplicate_of, hash,
+    stats}; stats is None when the file is invalid or a duplicate.
+    """
+    existing_names = st.session_state.indexed_names
+    indexed_hashes = st.session_state.indexed_hashes
+    pending_hashes = {}
+    seen_names = set()
+    entries = []
+    
+    for uploaded_file in uploaded_files:
+        if uploaded_file.name in existing_names or uploaded_file.name in seen_names:
+            continue
+        seen_names.add(uploaded_file.name)
+        
+        # Spool each upload to disk once; only the preview stays in memory
+        path = st.session_state.upload_paths.get(uploaded_file.file_id)
+        if path is None:
+            path, digest = _spool_upload(uploaded_file)
+            st.session_state.upload_paths[uploaded_file.file_id] = path
+            st.session_state.upload_hashes[path] = digest
+        
+        entry = {
+            'name': uploaded_file.name,
+            'path': path,
+            'error': None,
+            'duplicate_of': None,
+            'hash': None,
+            'stats': None
+        }
+        entries.append(entry)
+        
+        is_valid, error_msg = validate_text_file(path)
+        if not is_valid:
+            entry['error'] = error_msg
+            continue
+        
+        # Same content under another name would only re-embed duplicates
+        entry['hash'] = st.session_state.upload_hashes[path]
+        entry['duplicate_of'] = (
+            indexed_hashes.get(entry['hash']) or pending_hashes.get(entry['hash'])
+        )
+        if entry['duplicate_of']:
+            continue
+        
+        pending_hashes[entry['hash']] = uploaded_file.name
+        entry['stats'] = _file_stats(path)
+    
+    return entries
 
 
 def render_file_upload():
@@ -364,66 +636,57 @@ def render_file_upload():
                    f"**{st.session_state.total_chunks_indexed} total chunks**")
         
         with st.expander("📚 View Indexed Files", expanded=True):
-            for idx, file_info in enumerate(st.session_state.indexed_files, 1):
-                col1, col2, col3 = st.columns([3, 1, 1])
-                with col1:
-                    st.text(f"{idx}. {file_info['name']}")
-                with col2:
-                    st.caption(f"🧩 {file_info['chunks']} chunks")
-                with col3:
-                    st.caption(f"⏰ {file_info['timestamp']}")
+            render_indexed_files_table()
     
     # Process uploaded files
     if uploaded_files:
-        # Check for new files not yet indexed
-        existing_names = {f['name'] for f in st.session_state.indexed_files}
-        new_files = [f for f in uploaded_files if f.name not in existing_names]
-        
-        if new_files:
-            # Clear pending files before rebuilding (prevent duplicates)
-            st.session_state.pending_files = []
+        # Only rescan when the upload set or the indexed set actually changes
+        sig = (
+            tuple((f.file_id, f.size) for f in uploaded_files),
+            len(st.session_state.indexed_files)
+        )
+        if sig != st.session_state.upload_sig:
+            st.session_state.upload_scan = _scan_uploads(uploaded_files)
+            st.session_state.upload_sig = sig
+            st.session_state.pending_files = [
+                {'name': e['name'], 'path': e['path'], 'size': e['stats'][1], 'hash': e['hash']}
+                for e in st.session_state.upload_scan
+                if e['stats'] is not None
+            ]
+        
+        scan = st.session_state.upload_scan
+        
+        if scan:
             st.divider()
-            st.info(f"📥 **{len(new_files)} new file(s) ready to index**")
+            st.info(f"📥 **{len(scan)} new file(s) ready to index**")
             
             # Show preview of new files
-            for uploaded_file in new_files:
-                with st.expander(f"📄 Preview: {uploaded_file.name}", expanded=False):
-                    content = uploaded_file.read().decode('utf-8')
-                    
-                    # Validate
-                    is_valid, error_msg = validate_text_input(content)
+            for entry in scan:
+                with st.expander(f"📄 Preview: {entry['name']}", expanded=False):
+                    if entry['error']:
+                        st.error(f"❌ Invalid file: {entry['error']}")
+                        continue
                     
-                    if not is_valid:
-                        st.error(f"❌ Invalid file: {error_msg}")
+                    if entry['duplicate_of']:
+                        st.info(f"♻️ Duplicate content of **{entry['duplicate_of']}** - skipped")
                         continue
                     
+                    preview, n_chars, n_words, n_lines = entry['stats']
+                    
                     # Show stats
                     col1, col2, col3, col4 = st.columns(4)
                     with col1:
-                        st.metric("Characters", f"{len(content):,}")
+                        st.metric("Characters", f"{n_chars:,}")
                     with col2:
-                        st.metric("Words", f"{len(content.split()):,}")
+                        st.metric("Words", f"{n_words:,}")
                     with col3:
-                        st.metric("Lines", f"{len(content.split(chr(10))):,}")
+                        st.metric("Lines", f"{n_lines:,}")
                     with col4:
-                        estimated_chunks = max(1, len(content) // 600)
+                        estimated_chunks = max(1, n_chars // 600)
                         st.metric("Est. Chunks", estimated_chunks)
                     
                     # Preview text
-                    st.text_area(
-                        "Content Preview",
-                        content[:500] + ("..." if len(content) > 500 else ""),
-                        height=150,
-                        disabled=True,
-                        label_visibility="collapsed"
-                    )
-                    
-                    # Store for indexing (check if not already in pending)
-                    if not any(f['name'] == uploaded_file.name for f in st.session_state.pending_files):
-                        st.session_state.pending_files.append({
-                            'name': uploaded_file.name,
-                            'content': content
-                        })
+                    st.code(preview + ("..." if n_chars > len(preview) else ""), language=None)
             
             return True  # Signal that new files are ready
         else:
@@ -449,76 +712,89 @@ def render_indexing_section():
     with col2:
         # Show suggested template based on first file
         if not st.session_state.suggested_template and st.session_state.pending_files:
-            first_content = st.session_state.pending_files[0]['content']
-            st.session_state.suggested_template = suggest_template(first_content)
+            first_file = st.session_state.pending_files[0]
+            st.session_state.suggested_template = _suggest_template_cached(
+                first_file['hash'], first_file['path']
+            )
         
-        templates = {tid: t for tid, t in ((t['id'], t) for t in list_templates())}
-        suggested = templates.get(st.session_state.suggested_template, {})
+        suggested = _template_index()[2].get(st.session_state.suggested_template, {})
         
         if suggested:
             st.success(f"💡 Suggested: **{suggested['name']}**")
     
-    if st.button("🚀 Index All Files", type="primary", use_container_width=True):
+    if st.button(f"🚀 Index All ({len(st.session_state.pending_files)}) Files", type="primary", use_container_width=True):
         progress_bar = st.progress(0)
         status_text = st.empty()
         
         total_files = len(st.session_state.pending_files)
-        total_chunks = 0
+        status_text.text(f"📄 Indexing {total_files} file(s) in one batch...")
         
-        for idx, file_data in enumerate(st.session_state.pending_files, 1):
-            try:
-                # Update progress
-                progress = (idx - 1) / total_files
-                progress_bar.progress(progress)
-                status_text.text(f"📄 Indexing {idx}/{total_files}: {file_data['name']}...")
-                
-                # Index the file
-                result = index_document(
-                    st.session_state.collection,
-                    file_data['content'],
-                    file_data['name'],
-                    st.session_state.config
-                )
-                
-                # Store indexed file info
-                st.session_state.indexed_files.append({
-                    'name': file_data['name'],
-                    'chunks': result['chunks_indexed'],
-                    'timestamp': datetime.now().strftime("%H:%M:%S")
-                })
-                
-                total_chunks += result['chunks_indexed']
-                
-                status_text.success(f"✅ {file_data['name']}: {result['chunks_indexed']} chunks")
-                
-            except VectorStoreError as e:
-                status_text.error(f"❌ {file_data['name']}: Vector store error - {str(e)}")
-                st.info("💡 Try deleting the `chroma_db` folder and restarting")
-                
-            except ValueError as e:
-                status_text.error(f"❌ {file_data['name']}: Validation error - {str(e)}")
-                
-            except Exception as e:
-                status_text.error(f"❌ {file_data['name']}: {str(e)}")
-        
-        # Final progress
-        progress_bar.progress(1.0)
+        def on_indexed(done: int, total: int, doc_name: str):
+            progress_bar.progress(done / total)
+            status_text.text(f"📄 Indexed {done}/{total}: {doc_name}")
         
-        # Update state
-        st.session_state.total_chunks_indexed = sum(f['chunks'] for f in st.session_state.indexed_files)
-        st.session_state.document_indexed = True
-        st.session_state.pending_files = []  # Clear pending files
-        
-        # Success message
-        #st.balloons()
-        st.success(f"🎉 **Indexed {len(st.session_state.indexed_files)} file(s) successfully!** "
-                   f"Total: {st.session_state.total_chunks_indexed} chunks")
+        try:
+            # Files stream from disk through the chunk/embed/upsert pipeline
+            result = batch_index_files(
+                _get_collection(),
+                [(f['name'], f['path']) for f in st.session_state.pending_files],
+                st.session_state.config,
+                progress_callback=on_indexed
+            )
+            
+            indexed_at = datetime.now().strftime("%H:%M:%S")
+            hash_by_name = {f['name']: f['hash'] for f in st.session_state.pending_files}
+            _record_indexed([
+                {
+                    'name': doc['document'],
+                    'chunks': doc['chunks_indexed'],
+                    'timestamp': indexed_at,
+                    'hash': hash_by_name.get(doc['document'])
+                }
+                for doc in result['results']
+            ])
+            for doc in result['results']:
+                st.success(f"✅ {doc['document']}: {doc['chunks_indexed']} chunks")
+            
+            for doc in result['skipped']:
+                st.error(f"❌ {doc['document']}: Validation error - {doc['error']}")
+            
+            status_text.success(f"✅ Indexed {len(result['results'])}/{total_files} file(s)")
+            
+        except VectorStoreError as e:
+            status_text.error(f"❌ Vector store error - {str(e)}")
+            st.info("💡 Try deleting the `chroma_db` folder and restarting")
+            
+        except Exception as e:
+            status_text.error(f"❌ {str(e)}")
+            
+        else:
+            # Final progress
+            progress_bar.progress(1.0)
+            
+            # Update state; on failure the spooled uploads stay pending for a retry
+            st.session_state.document_indexed = True
+            _discard_spooled([f['path'] for f in st.session_state.pending_files])
+            st.session_state.pending_files = []  # Clear pending files
+            
+            # Success message
+            #st.balloons()
+            st.success(f"🎉 **Indexed {len(st.session_state.indexed_files)} file(s) successfully!** "
+                       f"Total: {st.session_state.total_chunks_indexed} chunks")
 
 
 def render_template_or_ai_choice():
     """Let user choose between template and AI workflow generation."""
     st.header("🗺️ Step 3: Generate Workflow")
     
+    # Report a failed background AI generation once
+    if st.session_state.ai_generation_error:
+        title, message, hint = st.session_state.ai_generation_error
+        st.session_state.ai_generation_error = None
+        st.error(f"❌ **{title}:** {message}")
+        if hint:
+            st.info(hint)
+    
     st.info("Choose how to generate your workflow:")
     
     col1, col2 = st.columns(2)
@@ -527,20 +803,18 @@ def render_template_or_ai_choice():
         st.subheader("📋 Use Template")
         st.caption("Faster, structured, consistent results")
         
-        templates = list_templates()
-        template_options = {t['name']: t['id'] for t in templates}
+        _, template_options, templates_by_id = _template_index()
+        template_names = list(template_options)
         
         # Highlight suggested template
         default_idx = 0
-        if st.session_state.suggested_template:
-            suggested_name = next((t['name'] for t in templates 
-                                 if t['id'] == st.session_state.suggested_template), None)
-            if suggested_name and suggested_name in template_options:
-                default_idx = list(template_options.keys()).index(suggested_name)
+        suggested = templates_by_id.get(st.session_state.suggested_template)
+        if suggested:
+            default_idx = template_names.index(suggested['name'])
         
         selected_template_name = st.selectbox(
             "Select template",
-            options=list(template_options.keys()),
+            options=template_names,
             index=default_idx,
             disabled=st.session_state.ai_generation_in_progress  # Disable during AI generation
         )
@@ -548,7 +822,7 @@ def render_template_or_ai_choice():
         selected_template_id = template_options[selected_template_name]
         
         # Show template details
-        template_info = next(t for t in templates if t['id'] == selected_template_id)
+        template_info = templates_by_id[selected_template_id]
         st.caption(f"📝 {template_info['description']}")
         st.caption(f"✅ {template_info['num_tasks']} predefined tasks")
         
@@ -559,7 +833,7 @@ def render_template_or_ai_choice():
         ):
             st.session_state.template_mode = True
             st.session_state.selected_template = selected_template_id
-            st.rerun()
+            maybe_rerun()
     
     with col2:
         st.subheader("🤖 AI Generated")
@@ -578,6 +852,13 @@ def render_template_or_ai_choice():
         
         st.caption("💡 Be specific about deliverables you need")
         
+        st.checkbox(
+            "♻️ Reuse a recent workflow for a similar goal",
+            key="ai_use_cache",
+            disabled=st.session_state.ai_generation_in_progress,
+            help="Untick to always regenerate with a fresh AI call"
+        )
+        
         # Button with validation
         button_disabled = (
             not workflow_target or 
@@ -626,6 +907,120 @@ def render_template_or_ai_choice():
             **Pro tip:** Mention specific deliverables you need (WBS, timeline, budget, etc.)
             """)
 
+
+def _prompt_complexity(prompt: str) -> str:
+    """Rough task complexity label from prompt length."""
+    if len(prompt) < 200:
+        return "🟢 Simple"
+    elif len(prompt) < 500:
+        return "🟡 Medium"
+    return "🔴 Complex"
+
+
+def _set_workflow(workflow: Dict):
+    """Store a freshly generated workflow with its per-render metadata precomputed."""
+    st.session_state.workflow = workflow
+    st.session_state.workflow_json = json.dumps(workflow, indent=2)
+    st.session_state.workflow_stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    st.session_state.task_rows = [
+        {
+            "Task": i,
+            "Name": task['name'],
+            "ID": task['task_id'],
+            "Output": task['output_format'],
+            "Complexity": _prompt_complexity(task['prompt']),
+            "Prompt": task['prompt']
+        }
+        for i, task in enumerate(workflow['tasks'], 1)
+    ]
+    st.session_state.workflow_depth = critical_path_length(workflow['tasks'])
+
+
+# How often the progress fragment polls the background generation; the
+# result is picked up at most this long after it arrives
+AI_PROGRESS_POLL_SECONDS = 0.5
+
+# Status messages, keyed by the stages generation reports as they start
+AI_GENERATION_STATUSES = {
+    "starting": "🚀 Starting AI generation...",
+    "retrieving": "🔍 Analyzing project specification...",
+    "sending": "🧠 Sending AI request and awaiting response...",
+    "parsing": "🔧 Parsing workflow JSON...",
+    "done": "🎉 Workflow ready!"
+}
+
+
+def _run_ai_generation(
+    run: Dict, collection, api_key: str, model: str, config: Dict, target: str, use_cache: bool
+):
+    """
+    Generate the AI workflow on a background thread.
+    
+    Never touches st.* APIs; stage updates and the result are published into
+    the run dict under run['lock'].
+    """
+    def on_stage(stage: str, fraction: float):
+        with run['lock']:
+            run['stage'] = stage
+            run['fraction'] = fraction
+    
+    try:
+        workflow = generate_workflow_from_ai_with_goal(
+            collection, api_key, model, config, target,
+            progress_callback=on_stage,
+            use_cache=use_cache
+        )
+        with run['lock']:
+            run['workflow'] = workflow
+    except AIError as e:
+        with run['lock']:
+            run['error'] = (
+                "AI Error", str(e),
+                "💡 **How to fix:**\n- Check your API key and internet connection\n- Try again (AI can be temporarily unavailable)\n- Or use a template instead"
+            )
+    except ValueError as e:
+        with run['lock']:
+            run['error'] = (
+                "Validation Error", str(e),
+                "💡 **How to fix:**\n- The AI generated invalid JSON\n- Try again with a clearer goal\n- Or use a template instead"
+            )
+    except Exception as e:
+        with run['lock']:
+            run['error'] = ("Error", str(e), None)
+    finally:
+        with run['lock']:
+            run['done'] = True
+
+
+def _start_ai_generation() -> Dict:
+    """Launch AI generation on a daemon thread and return its shared run state."""
+    run = {
+        'lock': threading.Lock(),
+        'stage': "starting",
+        'fraction': 0.0,
+        'workflow': None,
+        'error': None,
+        'done': False
+    }
+    
+    # Snapshot session values; session_state is only valid on the script thread
+    threading.Thread(
+        target=_run_ai_generation,
+        args=(
+            run,
+            _get_collection(),
+            st.session_state.config['api_key'],
+            st.session_state.config['model'],
+            st.session_state.config,
+            st.session_state.workflow_target,
+            st.session_state.ai_use_cache
+        ),
+        daemon=True
+    ).start()
+    
+    return run
+
+
 def render_workflow_generation_ai():
     """Generate workflow using AI with detailed progress indicators."""
     st.header("✨ Generating AI Workflow")
@@ -633,87 +1028,46 @@ def render_workflow_generation_ai():
     # Show workflow goal
     st.info(f"🎯 **Goal:** {st.session_state.workflow_target}")
     
-    # Progress indicator
-    progress_bar = st.progress(0)
-    status_container = st.empty()
-    
-    # Status messages
-    statuses = [
-        ("🔍 Analyzing project specification...", 0.2),
-        ("🧠 Sending AI request...", 0.3),
-        ("⏳ Awaiting AI response...", 0.5),
-        ("📥 Response received...", 0.7),
-        ("🔧 Parsing workflow JSON...", 0.85),
-        ("✅ Workflow generated...", 0.95),
-        ("🎉 Workflow ready!", 1.0)
-    ]
+    if st.session_state.ai_generation_run is None:
+        st.session_state.ai_generation_run = _start_ai_generation()
     
-    try:
-        import time
-        
-        for idx, (status_text, progress_value) in enumerate(statuses):
-            status_container.info(status_text)
-            progress_bar.progress(progress_value)
-            
-            # Actual AI generation happens at "Sending AI request"
-            if idx == 1:  # Index 1 is "Sending AI request"
-                # Call the actual AI generation with the workflow target
-                workflow = generate_workflow_from_ai_with_goal(
-                    st.session_state.collection,
-                    st.session_state.config['api_key'],
-                    st.session_state.config['model'],
-                    st.session_state.config,
-                    st.session_state.workflow_target
-                )
-                st.session_state.workflow = workflow
-            
-            # Small delay for UX (let users see each step)
-            time.sleep(0.3)
-        
-        # Success
-        progress_bar.progress(1.0)
-        status_container.success(f"🎉 Created: **{st.session_state.workflow['workflow_name']}**")
-        
-        # Update state - IMPORTANT: Set these BEFORE showing success
-        st.session_state.ai_generation_in_progress = False
+    render_ai_generation_progress()
+
+
+@st.fragment(run_every=AI_PROGRESS_POLL_SECONDS)
+def render_ai_generation_progress():
+    """Poll the background AI generation without blocking the page."""
+    run = st.session_state.ai_generation_run
+    if run is None:
+        return
+    
+    with run['lock']:
+        stage = run['stage']
+        fraction = run['fraction']
+        workflow = run['workflow']
+        error = run['error']
+        done = run['done']
+    
+    st.progress(fraction)
+    st.info(AI_GENERATION_STATUSES.get(stage, stage))
+    
+    if not done:
+        return
+    
+    # Update state - IMPORTANT: Set these BEFORE rerunning
+    st.session_state.ai_generation_run = None
+    st.session_state.ai_generation_in_progress = False
+    
+    if error is None:
+        _set_workflow(workflow)
         st.session_state.generation_complete = True
-        
-        # Show success message
-        #st.balloons()
-        st.success(f"✅ Generated {len(st.session_state.workflow['tasks'])} custom tasks!")
-        
-        # Force rerun to show workflow
-        time.sleep(1)
-        st.rerun()
-        
-    except AIError as e:
-        progress_bar.empty()
-        status_container.error("❌ AI generation failed")
-        st.error(f"**AI Error:** {str(e)}")
-        st.info("💡 **How to fix:**\n- Check your API key and internet connection\n- Try again (AI can be temporarily unavailable)\n- Or use a template instead")
-        
-        # Reset state
-        st.session_state.ai_generation_in_progress = False
-        st.session_state.generation_complete = False
-        
-    except ValueError as e:
-        progress_bar.empty()
-        status_container.error("❌ Invalid workflow")
-        st.error(f"**Validation Error:** {str(e)}")
-        st.info("💡 **How to fix:**\n- The AI generated invalid JSON\n- Try again with a clearer goal\n- Or use a template instead")
-        
-        # Reset state
-        st.session_state.ai_generation_in_progress = False
-        st.session_state.generation_complete = False
-        
-    except Exception as e:
-        progress_bar.empty()
-        status_container.error("❌ Unexpected error")
-        st.error(f"**Error:** {str(e)}")
-        
-        # Reset state
-        st.session_state.ai_generation_in_progress = False
+        st.toast(f"✅ Created {workflow['workflow_name']} with {len(workflow['tasks'])} tasks")
+    else:
+        # Shown by the choice screen on the next run
         st.session_state.generation_complete = False
+        st.session_state.ai_generation_error = error
+    
+    maybe_rerun()
 
 
 def render_workflow_generation_template():
@@ -727,19 +1081,18 @@ def render_workflow_generation_template():
             
             workflow = generate_workflow_from_template(
                 st.session_state.selected_template,
-                st.session_state.collection
+                _get_collection()
             )
             
             st.write(f"✅ Prepared {len(workflow['tasks'])} tasks")
             
-            st.session_state.workflow = workflow
+            _set_workflow(workflow)
             
             status.update(label="✅ Template applied!", state="complete")
-            st.success(f"🎉 Ready: **{workflow['workflow_name']}**")
+            # Toasts survive the rerun, so no pause is needed to show it
+            st.toast(f"🎉 Ready: {workflow['workflow_name']}")
             # Force rerun to show workflow
-            import time
-            time.sleep(0.5)
-            st.rerun()
+            maybe_rerun()
         except ValueError as e:
             status.update(label="❌ Template error", state="error")
             st.error(f"Error: {str(e)}")
@@ -749,6 +1102,7 @@ def render_workflow_generation_template():
             st.error(f"Error: {str(e)}")
 
 
+@st.fragment
 def render_workflow_display():
     """Display workflow with enhanced visualization."""
     if st.session_state.workflow:
@@ -769,168 +1123,240 @@ def render_workflow_display():
         # Task list
         st.markdown("### 📝 Task Breakdown:")
         
-        for i, task in enumerate(workflow['tasks'], 1):
-            with st.expander(f"Task {i}: {task['name']}", expanded=False):
-                col1, col2 = st.columns([3, 1])
-                
-                with col1:
-                    st.markdown(f"**ID:** `{task['task_id']}`")
-                    st.markdown(f"**Output:** {task['output_format']}")
-                
-                with col2:
-                    # Estimate complexity
-                    prompt_length = len(task['prompt'])
-                    if prompt_length < 200:
-                        complexity = "🟢 Simple"
-                    elif prompt_length < 500:
-                        complexity = "🟡 Medium"
-                    else:
-                        complexity = "🔴 Complex"
-                    st.info(complexity)
-                
-                st.markdown("**Instructions:**")
-                st.text_area(
-                    "prompt",
-                    task['prompt'],
-                    height=150,
-                    key=f"task_{i}_prompt",
-                    disabled=True,
-                    label_visibility="collapsed"
-                )
+        # One table instead of an expander per task
+        tasks = workflow['tasks']
+        st.dataframe(
+            st.session_state.task_rows,
+            use_container_width=True,
+            hide_index=True
+        )
+        
+        # Full instructions for one task at a time
+        selected = st.selectbox(
+            "View details",
+            range(len(tasks)),
+            format_func=lambda idx: f"Task {idx + 1}: {tasks[idx]['name']}",
+            key="task_detail"
+        )
+        st.markdown("**Instructions:**")
+        st.code(tasks[selected]['prompt'], language=None)
         
         # Export workflow
         with st.expander("💾 Export Workflow JSON", expanded=False):
+            # A str is passed through as-is; a dict would be re-dumped on every render
+            st.json(st.session_state.workflow_json, expanded=False)
             st.download_button(
                 "Download Workflow JSON",
-                data=json.dumps(workflow, indent=2),
-                file_name=f"workflow_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                data=st.session_state.workflow_json,
+                file_name=f"workflow_{st.session_state.workflow_stamp}.json",
                 mime="application/json"
             )
 
 
+def _run_workflow(run: Dict, tasks: List[Dict], collection, api_key: str, model: str, config: Dict):
+    """
+    Execute workflow tasks on a background thread.
+    
+    Never touches st.* APIs; each finished task is published into the run
+    dict under run['lock'] and the cancel flag is checked between results.
+    """
+    # One date for every output of the run
+    date_str = datetime.now().strftime("%Y-%m-%d")
+    
+    try:
+        for idx, success, result, error_type, previous_outputs in run_workflow_tasks(
+            tasks, collection, api_key, model, config,
+            should_stop=run['cancel'].is_set
+        ):
+            task = tasks[idx]
+            preview = None
+            
+            if success:
+                # Save output
+                output_path = save_output(
+                    content=result,
+                    task_name=task['name'],
+                    output_format=task['output_format'],
+                    date_str=date_str
+                )
+                task_result = TaskResult(idx, True, output_path)
+                preview = _truncate(result, 300)
+            else:
+                # Keep what a retry needs
+                task_result = TaskResult(
+                    idx, False,
+                    error=result,
+                    error_type=error_type,
+                    previous_outputs=previous_outputs
+                )
+            
+            with run['lock']:
+                run['results'].append((task_result, preview))
+            
+            if run['cancel'].is_set():
+                break
+    except Exception as e:
+        with run['lock']:
+            run['error'] = str(e)
+    finally:
+        with run['lock']:
+            run['done'] = True
+
+
+def _start_workflow_run(workflow: Dict) -> Dict:
+    """Launch the workflow on a daemon thread and return its shared run state."""
+    run = {
+        'lock': threading.Lock(),
+        'cancel': threading.Event(),
+        'total': len(workflow['tasks']),
+        'results': [],  # (TaskResult, preview) in completion order
+        'error': None,
+        'done': False
+    }
+    
+    # Snapshot session values; session_state is only valid on the script thread
+    threading.Thread(
+        target=_run_workflow,
+        args=(
+            run,
+            workflow['tasks'],
+            _get_collection(),
+            st.session_state.config['api_key'],
+            st.session_state.config['model'],
+            st.session_state.config
+        ),
+        daemon=True
+    ).start()
+    
+    return run
+
+
 def render_workflow_execution():
     """Execute workflow with enhanced error handling."""
     st.header("⚡ Step 4: Execute Workflow")
     
-    workflow = st.session_state.workflow
-    estimated_time = len(workflow['tasks']) * 20
-    
-    st.info(f"🎯 Will execute {len(workflow['tasks'])} tasks | ⏱️ Est. {estimated_time}s")
-    
-    if st.button("🚀 Execute Workflow", type="primary", use_container_width=True):
-        output_files = []
-        previous_outputs = []
-        errors = []
-        st.session_state.failed_tasks = []  # Reset failed tasks
-        st.session_state.task_outputs = {}  # Reset task outputs
-        
-        # Progress
-        progress_bar = st.progress(0)
-        status_text = st.empty()
+    if st.session_state.workflow_run is None:
+        workflow = st.session_state.workflow
+        # Independent tasks overlap, so only the longest dependency chain adds up
+        estimated_time = st.session_state.workflow_depth * 20
         
-        total_tasks = len(workflow['tasks'])
+        st.info(f"🎯 Will execute {len(workflow['tasks'])} tasks | ⏱️ Est. {estimated_time}s")
         
-        for i, task in enumerate(workflow['tasks'], 1):
-            progress = i / total_tasks
-            progress_bar.progress(progress)
-            status_text.text(f"Executing {i}/{total_tasks}: {task['name']}...")
-            
+        if st.button("🚀 Execute Workflow", type="primary", use_container_width=True):
+            st.session_state.workflow_run = _start_workflow_run(workflow)
+        else:
+            return
+    
+    render_workflow_progress()
+
+
+@st.fragment(run_every=1)
+def render_workflow_progress():
+    """Poll the background run and redraw progress without blocking the page."""
+    run = st.session_state.workflow_run
+    if run is None:
+        return
+    
+    with run['lock']:
+        results = list(run['results'])
+        run_error = run['error']
+        done = run['done']
+    
+    tasks = st.session_state.workflow['tasks']
+    total_tasks = run['total']
+    
+    # Progress
+    st.progress(len(results) / total_tasks)
+    if done:
+        st.text("✅ Workflow execution complete!")
+    elif run['cancel'].is_set():
+        st.text("⏹️ Stopping after the running task(s)...")
+    else:
+        st.text(f"Completed {len(results)}/{total_tasks} (independent tasks run in parallel)...")
+        if st.button("⏹️ Stop", key="stop_workflow"):
+            run['cancel'].set()
+    
+    # One placeholder per task keeps workflow order as results arrive out of order
+    slots = [st.empty() for _ in tasks]
+    
+    for task_result, preview in results:
+        task = tasks[task_result.idx]
+        i = task_result.idx + 1
+        with slots[task_result.idx].container():
             with st.expander(f"Task {i}: {task['name']}", expanded=True):
-                with st.spinner("Processing..."):
-                    # Execute task
-                    success, result, error_type = execute_task_safe(
-                        task=task,
-                        collection=st.session_state.collection,
-                        api_key=st.session_state.config['api_key'],
-                        model=st.session_state.config['model'],
-                        config=st.session_state.config,
-                        previous_outputs=previous_outputs
-                    )
+                if task_result.ok:
+                    st.success(f"✅ Complete! → `{task_result.output}`")
                     
-                    if success:
-                        # Save output
-                        output_path = save_output(
-                            content=result,
-                            task_name=task['name'],
-                            output_format=task['output_format']
-                        )
-                        
-                        output_files.append(output_path)
-                        previous_outputs.append(f"[Task {task['task_id']}]\n{result}")
-                        st.session_state.task_outputs[i-1] = result
-                        
-                        st.success(f"✅ Complete! → `{output_path}`")
-                        
-                        # Preview
-                        preview_len = min(300, len(result))
-                        st.text_area(
-                            "Preview",
-                            result[:preview_len] + ("..." if len(result) > preview_len else ""),
-                            height=120,
-                            key=f"result_{i}",
-                            disabled=True,
-                            label_visibility="collapsed"
-                        )
-                    else:
-                        # Handle error
-                        st.error(f"❌ Task failed: {result}")
-                        errors.append({
-                            "task": task['name'],
-                            "error": result,
-                            "type": error_type
-                        })
-                        
-                        # Store failed task for retry
-                        st.session_state.failed_tasks.append({  
-                            'task_index': i - 1,
-                            'task': task,
-                            'error': result,
-                            'error_type': error_type,
-                            'previous_outputs': previous_outputs.copy()
-                        })
-
-                        # Provide recovery options
-                        if error_type == "AI_ERROR":
-                            st.warning("💡 Try: Check API key, wait a moment, retry")
-                        elif error_type == "VECTOR_ERROR":
-                            st.warning("💡 Try: Reindex document, restart app")
-        
-        # Final update
-        progress_bar.progress(1.0)
-        status_text.text("✅ Workflow execution complete!")
-        
-        # Update state
-        st.session_state.output_files = output_files
-        st.session_state.execution_errors = errors
-        st.session_state.workflow_executed = True
-        
-        # Save history
-        history_file = save_workflow_history(workflow, output_files)
-        
-        # Final status
-        if not errors:
-            #st.balloons()
-            st.success(f"🎉 Perfect! Generated {len(output_files)} files")
-        else:
-            st.warning(f"⚠️ Completed with {len(errors)} errors. {len(output_files)} files generated.")
-        
-        st.info(f"💾 History saved: `{history_file}`")
+                    # Preview
+                    st.code(preview, language=None)
+                else:
+                    # Handle error
+                    st.error(f"❌ Task failed: {task_result.error}")
+                    
+                    # Provide recovery options
+                    if task_result.error_type == "AI_ERROR":
+                        st.warning("💡 Try: Check API key, wait a moment, retry")
+                    elif task_result.error_type == "VECTOR_ERROR":
+                        st.warning("💡 Try: Reindex document, restart app")
+    
+    if not done:
+        return
+    
+    # Results are filled in by task index; tasks that never ran stay None
+    task_results = [None] * total_tasks
+    for task_result, _ in results:
+        task_results[task_result.idx] = task_result
+    
+    output_files = [r.output for r in task_results if r is not None and r.ok]
+    errors = [
+        {"task": tasks[r.idx]['name'], "error": r.error, "type": r.error_type}
+        for r in task_results if r is not None and not r.ok
+    ]
+    if run_error:
+        errors.append({"task": "workflow", "error": run_error, "type": "UNKNOWN_ERROR"})
+    
+    # Update state
+    st.session_state.task_results = task_results
+    st.session_state.output_files = output_files
+    st.session_state.execution_errors = errors
+    st.session_state.workflow_executed = True
+    st.session_state.workflow_run = None
+    
+    # Save history
+    history_file = save_workflow_history(st.session_state.workflow, output_files)
+    _workflow_history_summary.clear()
+    
+    # Final status; toasts outlive the rerun below
+    if not errors:
+        st.toast(f"🎉 Perfect! Generated {len(output_files)} files")
+    else:
+        st.toast(f"⚠️ Completed with {len(errors)} errors. {len(output_files)} files generated.")
+    st.toast(f"💾 History saved: {history_file}")
+    
+    maybe_rerun()
 
 # ADD this new function after render_workflow_execution():
 
+def _failed_task_results() -> List:
+    """TaskResults of the tasks that failed in the last execution."""
+    return [r for r in st.session_state.task_results if r is not None and not r.ok]
+
+
+@st.fragment
 def render_retry_failed_tasks():
     """Allow user to retry failed tasks."""
-    if st.session_state.failed_tasks:
+    failed_results = _failed_task_results()
+    if failed_results:
         st.divider()
         st.header("🔄 Retry Failed Tasks (check you AI API connection before retry)")
         
-        st.warning(f"⚠️ {len(st.session_state.failed_tasks)} task(s) failed during execution")
+        st.warning(f"⚠️ {len(failed_results)} task(s) failed during execution")
         
-        for failed_info in st.session_state.failed_tasks:
-            task_idx = failed_info['task_index']
-            task = failed_info['task']
-            error = failed_info['error']
-            error_type = failed_info['error_type']
+        for failed_info in failed_results:
+            task_idx = failed_info.idx
+            task = st.session_state.workflow['tasks'][task_idx]
+            error = failed_info.error
+            error_type = failed_info.error_type
             
             with st.expander(f"❌ Task {task_idx + 1}: {task['name']}", expanded=True):
                 st.error(f"**Error:** {error}")
@@ -956,11 +1382,11 @@ def render_retry_failed_tasks():
                             # Retry the task
                             success, result, new_error_type = execute_task_safe(
                                 task=task,
-                                collection=st.session_state.collection,
+                                collection=_get_collection(),
                                 api_key=st.session_state.config['api_key'],
                                 model=st.session_state.config['model'],
                                 config=st.session_state.config,
-                                previous_outputs=failed_info['previous_outputs']
+                                previous_outputs=failed_info.previous_outputs
                             )
                             
                             if success:
@@ -973,13 +1399,9 @@ def render_retry_failed_tasks():
                                 
                                 # Update state
                                 st.session_state.output_files.append(output_path)
-                                st.session_state.task_outputs[task_idx] = result
                                 
-                                # Remove from failed tasks
-                                st.session_state.failed_tasks = [
-                                    f for f in st.session_state.failed_tasks 
-                                    if f['task_index'] != task_idx
-                                ]
+                                # Replaces the failed result in place
+                                st.session_state.task_results[task_idx] = TaskResult(task_idx, True, output_path)
                                 
                                 # Remove from errors
                                 st.session_state.execution_errors = [
@@ -987,12 +1409,10 @@ def render_retry_failed_tasks():
                                     if e.get('task') != task['name']
                                 ]
                                 
-                                st.success(f"✅ Task {task_idx + 1} completed successfully!")
-                                st.info(f"📁 Saved to: `{output_path}`")
-                                
-                                import time
-                                time.sleep(1)
-                                st.rerun()
+                                # Toasts survive the rerun, so no pause is needed to show them
+                                st.toast(f"✅ Task {task_idx + 1} completed successfully!")
+                                st.toast(f"📁 Saved to: {output_path}")
+                                maybe_rerun()
                             else:
                                 st.error(f"❌ Retry failed: {result}")
                                 st.warning("💡 You can try again after waiting a bit longer")
@@ -1001,41 +1421,48 @@ def render_retry_failed_tasks():
                     st.caption(f"**Original error type:** {error_type}")
                     st.caption("Retrying will use the same context and previous outputs")
 
+@st.fragment
 def render_outputs_section():
     """Enhanced output download section."""
     if st.session_state.output_files:
         st.header("📥 Download Results")
         
+        # One stat per file serves both the cache keys and the file cards
+        paths = tuple(st.session_state.output_files)
+        stats = [os.stat(p) for p in paths]
+        
         col1, col2 = st.columns([2, 1])
         
         with col1:
-            st.success(f"✅ {len(st.session_state.output_files)} files ready")
+            st.success(f"✅ {len(paths)} files ready")
         
         with col2:
-            if st.button("📦 Export All as ZIP", use_container_width=True):
-                st.info("💡 ZIP export coming soon!")
+            st.download_button(
+                label="📦 Export All as ZIP",
+                data=_build_zip_bytes(paths, tuple(stat.st_mtime for stat in stats)),
+                file_name="outputs.zip",
+                mime="application/zip",
+                use_container_width=True
+            )
         
         # File list
         cols = st.columns(2)
         
-        for i, filepath in enumerate(st.session_state.output_files):
+        for i, (filepath, stat) in enumerate(zip(paths, stats)):
             col = cols[i % 2]
             
             with col:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
+                # The card itself only needs the stat, not the file contents
                 filename = os.path.basename(filepath)
-                file_size = len(content)
                 
                 # File card
                 with st.container():
                     st.markdown(f"**{filename}**")
-                    st.caption(f"📊 {file_size:,} chars")
+                    st.caption(f"📊 {stat.st_size:,} bytes")
                     
                     st.download_button(
                         label="⬇️ Download",
-                        data=content,
+                        data=_read_output(filepath, stat.st_mtime),
                         file_name=filename,
                         mime="text/plain",
                         key=f"download_{i}",
@@ -1044,6 +1471,7 @@ def render_outputs_section():
 
 # New feature: add generated data to training for next workflow
 
+@st.fragment
 def render_add_to_training_section():
     """Allow user to add generated outputs to ChromaDB for next workflow."""
     if st.session_state.output_files and st.session_state.workflow_executed:
@@ -1068,43 +1496,37 @@ def render_add_to_training_section():
                         use_container_width=True):
                 with st.spinner("Adding generated files to training..."):
                     progress_bar = st.progress(0)
-                    total_files = len(st.session_state.output_files)
                     
                     newly_indexed = []
                     
-                    for idx, filepath in enumerate(st.session_state.output_files, 1):
-                        try:
-                            # Read the file
-                            with open(filepath, 'r', encoding='utf-8') as f:
-                                content = f.read()
-                            
-                            # Get filename
-                            filename = os.path.basename(filepath)
-                            
-                            # Index it
-                            result = index_document(
-                                st.session_state.collection,
-                                content,
-                                filename,
-                                st.session_state.config
-                            )
-                            
+                    def on_indexed(done: int, total: int, doc_name: str):
+                        progress_bar.progress(done / total)
+                    
+                    try:
+                        # All outputs go through one pipeline run with coalesced writes
+                        result = batch_index_files(
+                            _get_collection(),
+                            [(os.path.basename(p), p) for p in st.session_state.output_files],
+                            st.session_state.config,
+                            progress_callback=on_indexed
+                        )
+                        
+                        indexed_at = datetime.now().strftime("%H:%M:%S")
+                        for doc in result['results']:
                             newly_indexed.append({
-                                'name': filename,
-                                'chunks': result['chunks_indexed'],
-                                'timestamp': datetime.now().strftime("%H:%M:%S")
+                                'name': doc['document'],
+                                'chunks': doc['chunks_indexed'],
+                                'timestamp': indexed_at
                             })
-                            
-                            progress_bar.progress(idx / total_files)
-                            
-                        except Exception as e:
-                            st.error(f"❌ Failed to index {filename}: {str(e)}")
+                        
+                        for doc in result['skipped']:
+                            st.error(f"❌ Failed to index {doc['document']}: {doc['error']}")
+                        
+                    except Exception as e:
+                        st.error(f"❌ Failed to index generated files: {str(e)}")
                     
                     # Add to indexed files
-                    st.session_state.indexed_files.extend(newly_indexed)
-                    st.session_state.total_chunks_indexed = sum(
-                        f['chunks'] for f in st.session_state.indexed_files
-                    )
+                    _record_indexed(newly_indexed)
                     
                     # Reset workflow state but keep files indexed
                     st.session_state.workflow = None
@@ -1114,15 +1536,14 @@ def render_add_to_training_section():
                     st.session_state.template_mode = False
                     st.session_state.selected_template = None
                     st.session_state.ai_generation_in_progress = False
+                    st.session_state.ai_generation_run = None
                     st.session_state.generation_complete = False
                     
                     progress_bar.progress(1.0)
-                    st.success(f"✅ Added {len(newly_indexed)} files to training!")
+                    st.toast(f"✅ Added {len(newly_indexed)} files to training!")
                     #st.balloons()
                     
-                    import time
-                    time.sleep(1)
-                    st.rerun()
+                    maybe_rerun()
         
         with col2:
             st.caption("This will:")
@@ -1131,6 +1552,7 @@ def render_add_to_training_section():
             st.caption("✅ Reset workflow for new generation")
             st.caption("✅ Preserve all indexed content")
 
+@st.fragment
 def render_reset_section():
     """Reset workflow with confirmation."""
     if st.session_state.workflow_executed:
@@ -1148,10 +1570,20 @@ def render_reset_section():
                 st.session_state.template_mode = False
                 st.session_state.selected_template = None
                 st.session_state.ai_generation_in_progress = False
+                st.session_state.ai_generation_run = None
                 st.session_state.generation_complete = False
-                st.rerun()
+                maybe_rerun()
         with col2:
             if st.button("🗑️ Clear All & Start Over", type="secondary", use_container_width=True):
+                # Drop this session's documents from the shared store. Cached AI
+                # workflows are keyed by retrieved context, so ones built on
+                # these documents can no longer match and need no clearing.
+                try:
+                    remove_documents(_get_collection(), list(st.session_state.indexed_names))
+                except VectorStoreError as e:
+                    st.error(f"❌ Could not remove indexed documents: {str(e)}")
+                    return
+                
                 # Reset everything including files
                 st.session_state.document_indexed = False
                 st.session_state.workflow = None
@@ -1163,18 +1595,79 @@ def render_reset_section():
                 st.session_state.selected_template = None
                 st.session_state.suggested_template = None
                 st.session_state.ai_generation_in_progress = False
+                st.session_state.ai_generation_run = None
                 st.session_state.generation_complete = False
                 st.session_state.indexed_files = []
+                st.session_state.indexed_names = set()
+                st.session_state.indexed_hashes = {}
                 st.session_state.total_chunks_indexed = 0
+                _discard_spooled(list(st.session_state.upload_paths.values()))
                 st.session_state.pending_files = []
                 
-                # Clear ChromaDB
-                try:
-                    st.session_state.collection = initialize_vector_store()
-                except:
-                    pass
+                # The shared ChromaDB handle stays open: reopening it would
+                # re-read SQLite segments and reload the HNSW index for every
+                # session
                 
-                st.rerun()
+                maybe_rerun()
+
+
+# Static footer markup
+FOOTER_HTML = """
+        <div style='text-align: center; color: #666; padding: 20px;'>
+            <p>🤖 Sophia Prototype v1.0 (Stage 3: Production Ready)</p>
+            <p>With Templates • Error Handling • History • Validation</p>
+        </div>
+    """
+
+
+@st.fragment
+def render_footer():
+    """Render the static footer in its own fragment."""
+    st.divider()
+    st.markdown(FOOTER_HTML, unsafe_allow_html=True)
+
+
+# ============================================================================
+# STEP ROUTING
+# ============================================================================
+
+def _generation_stage() -> str:
+    """Derive the Step 3 stage from the session flags."""
+    if st.session_state.workflow:
+        return "review"
+    if st.session_state.template_mode:
+        return "idle" if st.session_state.generation_complete else "template"
+    if st.session_state.ai_generation_in_progress:
+        return "ai"
+    return "choose"
+
+
+def _page_stage() -> Tuple:
+    """Everything main() routes on; equal stages render the same sections."""
+    return (
+        st.session_state.api_configured,
+        st.session_state.document_indexed,
+        _generation_stage(),
+        st.session_state.workflow_executed,
+        len(_failed_task_results())
+    )
+
+
+def maybe_rerun():
+    """Rerun the script only if a state change altered the page stage."""
+    if _page_stage() != st.session_state.rendered_stage:
+        st.rerun()
+
+
+# Step 3 router: stage -> render function
+STEP3_VIEWS = {
+    "choose": render_template_or_ai_choice,
+    "template": render_workflow_generation_template,
+    "ai": render_workflow_generation_ai,
+    "review": render_workflow_display,
+    "idle": lambda: None
+}
+
 
 # ============================================================================
 # MAIN APPLICATION
@@ -1184,18 +1677,21 @@ def main():
     """Main application with enhanced flow control."""
     init_session_state()
     
+    # Import the core engine (cheap after the first run: cached in sys.modules)
+    with st.spinner("Loading Sophia engine..."):
+        _load_core()
+    
     # System initialization
     success, error_msg = initialize_system()
     if not success:
         st.error(error_msg)
         st.stop()
     
+    st.session_state.rendered_stage = _page_stage()
+    
     # Header
     render_header()
     
-    # Sidebar
-    render_sidebar()
-    
     st.divider()
     
     # Main workflow
@@ -1205,6 +1701,8 @@ def main():
     
     if not st.session_state.api_configured:
         st.info("👆 Please configure your API key and model above to continue")
+        with st.sidebar:
+            render_sidebar()
         st.stop()
     
     st.divider()
@@ -1232,21 +1730,8 @@ def main():
     if st.session_state.document_indexed:
         st.divider()
         
-        # Step 3: Generate workflow
-        if not st.session_state.workflow:
-            if st.session_state.template_mode is False and st.session_state.selected_template is None and st.session_state.ai_generation_in_progress is False:
-                
-                render_template_or_ai_choice()
-            elif st.session_state.template_mode:
-                if not st.session_state.generation_complete:
-                    render_workflow_generation_template()
-            elif st.session_state.ai_generation_in_progress:
-                render_workflow_generation_ai()
-            else:
-                
-                render_template_or_ai_choice()
-        else:
-            render_workflow_display()
+        # Step 3: Generate workflow - exactly one view for the current stage
+        STEP3_VIEWS[_generation_stage()]()
     
     if st.session_state.workflow and not st.session_state.workflow_executed:
         st.divider()
@@ -1254,7 +1739,7 @@ def main():
         # Step 4: Execute
         render_workflow_execution()
     
-    if st.session_state.failed_tasks and st.session_state.workflow_executed:
+    if st.session_state.workflow_executed and _failed_task_results():
         render_retry_failed_tasks()
 
     if st.session_state.workflow_executed:
@@ -1269,17 +1754,13 @@ def main():
         # Reset
         render_reset_section()
     
+    # Sidebar last: its position on the page does not depend on call order,
+    # and rendering it after the steps shows their state changes without a rerun
+    with st.sidebar:
+        render_sidebar()
+    
     # Footer
-    st.divider()
-    st.markdown(
-        """
-        <div style='text-align: center; color: #666; padding: 20px;'>
-            <p>🤖 Sophia Prototype v1.0 (Stage 3: Production Ready)</p>
-            <p>With Templates • Error Handling • History • Validation</p>
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+    render_footer()
 
 
 if __name__ == "__main__":
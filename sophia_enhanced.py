@@ -15,14 +15,23 @@ Enhancements:
 This builds on Stage 1 core with production-grade reliability.
 """
 
+import copy
+import hashlib
 import os
 import json
+import logging
+import math
+import queue
+import threading
 import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from functools import lru_cache, partial
+from typing import Callable, List, Dict, Optional, Tuple
 from dotenv import load_dotenv
 import chromadb
-from chromadb.config import Settings
 
 # Import templates
 from templates import (
@@ -32,6 +41,8 @@ from templates import (
     suggest_template
 )
 
+logger = logging.getLogger(__name__)
+
 
 # ============================================================================
 # CONFIGURATION WITH VALIDATION
@@ -75,7 +86,8 @@ def load_env_config() -> Dict[str, str]:
         'max_retries': int(os.getenv('MAX_RETRIES', '3')),
         'timeout': int(os.getenv('API_TIMEOUT', '60')),
         'chunk_size': int(os.getenv('CHUNK_SIZE', '800')),
-        'chunk_overlap': int(os.getenv('CHUNK_OVERLAP', '200'))
+        'chunk_overlap': int(os.getenv('CHUNK_OVERLAP', '200')),
+        'max_parallel_tasks': int(os.getenv('MAX_PARALLEL_TASKS', str(MAX_PARALLEL_TASKS)))
     }
     
     return config
@@ -90,6 +102,30 @@ class VectorStoreError(Exception):
     pass
 
 
+_embedding_function = None
+
+
+def get_embedding_function():
+    """
+    Return the embedding function shared by the collection and batch indexing.
+    
+    Using one explicit instance guarantees that embeddings computed ahead of
+    collection.upsert() match what the collection computes for queries.
+    """
+    global _embedding_function
+    if _embedding_function is None:
+        from chromadb.utils import embedding_functions
+        _embedding_function = embedding_functions.DefaultEmbeddingFunction()
+    return _embedding_function
+
+
+# Records buffered before they are inserted into the HNSW graph, and before
+# the graph is persisted to disk; Chroma's defaults (100 / 1000) make bulk
+# indexing flush many small segments
+HNSW_BATCH_SIZE = 512
+HNSW_SYNC_THRESHOLD = 4096
+
+
 def initialize_vector_store() -> chromadb.Collection:
     """
     Initialize ChromaDB with error handling.
@@ -104,7 +140,13 @@ def initialize_vector_store() -> chromadb.Collection:
         client = chromadb.PersistentClient(path="./chroma_db")
         collection = client.get_or_create_collection(
             name="project_docs",
-            metadata={"description": "Sophia project specification documents"}
+            metadata={
+                "description": "Sophia project specification documents",
+                # Bulk-friendly HNSW flushing (only applied when the collection is created)
+                "hnsw:batch_size": HNSW_BATCH_SIZE,
+                "hnsw:sync_threshold": HNSW_SYNC_THRESHOLD
+            },
+            embedding_function=get_embedding_function()
         )
         return collection
     except Exception as e:
@@ -121,13 +163,54 @@ def validate_text_input(text: str) -> Tuple[bool, Optional[str]]:
     Returns:
         Tuple of (is_valid, error_message)
     """
-    if not text or not text.strip():
+    # isspace() stops at the first visible character instead of copying like strip()
+    if not text or text.isspace():
+        return False, "Text is empty or contains only whitespace"
+    
+    n = len(text)
+    if n < 100:
+        return False, "Text is too short (minimum 100 characters). Please provide more detail."
+    
+    if n > 100000:
+        return False, "Text is too long (maximum 100,000 characters). Please split into smaller documents."
+    
+    return True, None
+
+
+def validate_text_file(path: str, read_size: int = 1 << 16) -> Tuple[bool, Optional[str]]:
+    """
+    Apply validate_text_input() rules to a file by streaming it.
+    
+    Args:
+        path: Path to a UTF-8 text file
+        read_size: Characters read from disk per block
+    
+    Returns:
+        Tuple of (is_valid, error_message)
+    """
+    n_chars = 0
+    has_text = False
+    
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            while True:
+                block = f.read(read_size)
+                if not block:
+                    break
+                n_chars += len(block)
+                has_text = has_text or not block.isspace()
+                if n_chars > 100000:
+                    break
+    except UnicodeDecodeError:
+        return False, "File is not valid UTF-8 text"
+    
+    if not has_text:
         return False, "Text is empty or contains only whitespace"
     
-    if len(text) < 100:
+    if n_chars < 100:
         return False, "Text is too short (minimum 100 characters). Please provide more detail."
     
-    if len(text) > 100000:
+    if n_chars > 100000:
         return False, "Text is too long (maximum 100,000 characters). Please split into smaller documents."
     
     return True, None
@@ -154,19 +237,85 @@ def chunk_text(text: str, chunk_size: int = 800, overlap: int = 200) -> List[str
     if chunk_size < 100:
         raise ValueError("Chunk size too small (minimum 100)")
     
-    chunks = []
-    start = 0
+    # Slices are never empty, so isspace() matches the old strip() test
+    # without allocating a stripped copy of every chunk
+    chunks = (text[start:start + chunk_size] for start in range(0, len(text), chunk_size - overlap))
+    return [chunk for chunk in chunks if not chunk.isspace()]
+
+
+def iter_file_chunks(
+    path: str,
+    chunk_size: int = 800,
+    overlap: int = 200,
+    read_size: int = 1 << 16
+):
+    """
+    Stream overlapping chunks from a text file without loading it whole.
     
-    while start < len(text):
-        end = start + chunk_size
-        chunk = text[start:end]
-        
-        if chunk.strip():
-            chunks.append(chunk)
-        
-        start += (chunk_size - overlap)
+    Produces exactly the same chunks as chunk_text() on the full file
+    contents, but only holds roughly one read block in memory.
+    
+    Args:
+        path: Path to a UTF-8 text file
+        chunk_size: Size of each chunk
+        overlap: Overlap between chunks
+        read_size: Characters read from disk per block
+    
+    Yields:
+        Text chunks
+    
+    Raises:
+        ValueError: If parameters are invalid
+    """
+    if chunk_size <= overlap:
+        raise ValueError("Chunk size must be greater than overlap")
+    
+    if chunk_size < 100:
+        raise ValueError("Chunk size too small (minimum 100)")
+    
+    step = chunk_size - overlap
+    buffer = ""
+    pos = 0
     
-    return chunks
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            block = f.read(read_size)
+            if not block:
+                break
+            
+            # Drop consumed text before appending the next block
+            buffer = buffer[pos:] + block
+            pos = 0
+            
+            # A chunk is final once a full chunk_size is buffered
+            while len(buffer) - pos >= chunk_size:
+                chunk = buffer[pos:pos + chunk_size]
+                if not chunk.isspace():
+                    yield chunk
+                pos += step
+    
+    # Flush the tail, mirroring chunk_text's `while start < len(text)`
+    while pos < len(buffer):
+        chunk = buffer[pos:pos + chunk_size]
+        if not chunk.isspace():
+            yield chunk
+        pos += step
+
+
+def _drop_stale_chunks(collection: chromadb.Collection, counts: Dict[str, int]):
+    """
+    Delete chunks left over from longer previous copies of re-indexed documents.
+    
+    Chunks are upserted under deterministic ids, so only indices at or past
+    each document's new chunk count can still hold old content.
+    """
+    clauses = [
+        {"$and": [{"source": doc_name}, {"chunk_index": {"$gte": n}}]}
+        for doc_name, n in counts.items()
+    ]
+    if not clauses:
+        return
+    collection.delete(where=clauses[0] if len(clauses) == 1 else {"$or": clauses})
 
 
 def index_document(
@@ -197,11 +346,6 @@ def index_document(
         raise ValueError(f"Invalid input: {error_msg}")
     
     try:
-        # Clear previous document if exists
-        existing_ids = collection.get(where={"source": doc_name})["ids"]
-        if existing_ids:
-            collection.delete(ids=existing_ids)
-        
         # Chunk the document
         chunks = chunk_text(
             text,
@@ -209,33 +353,402 @@ def index_document(
             overlap=config.get('chunk_overlap', 200)
         )
         
-        # Prepare data for ChromaDB
+        # Prepare data for ChromaDB (one timestamp for the whole document)
+        timestamp = datetime.now().isoformat()
         ids = [f"{doc_name}_chunk_{i}" for i in range(len(chunks))]
         metadatas = [
             {
                 "source": doc_name,
                 "chunk_index": i,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": timestamp
             }
             for i in range(len(chunks))
         ]
         
-        # Add to vector store
-        collection.add(
+        # Ids are deterministic, so upsert replaces a previous copy in place
+        collection.upsert(
             documents=chunks,
             metadatas=metadatas,
             ids=ids
         )
+        _drop_stale_chunks(collection, {doc_name: len(chunks)})
         
         return {
             "success": True,
             "chunks_indexed": len(chunks),
             "document": doc_name,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": timestamp
         }
         
     except Exception as e:
         raise VectorStoreError(f"Indexing failed: {str(e)}")
+    finally:
+        _clear_query_cache()
+
+
+# Indexing pipeline tuning: load -> chunk -> embed -> upsert
+PIPELINE_QUEUE_SIZE = 4      # Bounded hand-off between stages
+EMBED_BATCH_SIZE = 64        # Chunks per embedding call
+EMBED_IDLE_SECONDS = 0.25    # Flush a partial embedding batch after this idle time
+EMBED_WORKERS = 2            # Embedding calls kept in flight at once
+UPSERT_BATCH_SIZE = 256      # Records per collection.upsert() call
+
+_STAGE_DONE = object()  # End-of-stream sentinel passed between stages
+
+
+def _load_worker(docs: List[Tuple[str, Callable]], chunk_q: queue.Queue):
+    """Stage 1: feed (doc_name, make_chunks) items into the pipeline."""
+    for doc in docs:
+        chunk_q.put(doc)
+    chunk_q.put(_STAGE_DONE)
+
+
+def _report_if_stored(tally: Dict, doc_name: str, progress_q: queue.Queue):
+    """Report doc_name once its chunk count is known and all chunks are stored."""
+    # Caller holds tally['lock']; exactly one of the two stages sees equality
+    expected = tally['expected'].get(doc_name)
+    if expected is not None and tally['written'].get(doc_name, 0) == expected:
+        progress_q.put(doc_name)
+
+
+def _chunk_worker(
+    chunk_q: queue.Queue,
+    embed_q: queue.Queue,
+    progress_q: queue.Queue,
+    tally: Dict,
+    errors: List[Exception]
+):
+    """Stage 2: stream each document as (doc_name, chunk_index, text) records."""
+    while True:
+        item = chunk_q.get()
+        if item is _STAGE_DONE:
+            break
+        if errors:
+            continue
+        
+        doc_name, make_chunks = item
+        try:
+            # Forward chunks in embedding-sized slices as they are produced
+            records = []
+            count = 0
+            for chunk in make_chunks():
+                records.append((doc_name, count, chunk))
+                count += 1
+                if len(records) >= EMBED_BATCH_SIZE:
+                    embed_q.put(records)
+                    records = []
+            if records:
+                embed_q.put(records)
+            
+            # The total is only known now; upserts may already be done
+            with tally['lock']:
+                tally['expected'][doc_name] = count
+                _report_if_stored(tally, doc_name, progress_q)
+        except Exception as e:
+            errors.append(e)
+    
+    embed_q.put(_STAGE_DONE)
+
+
+def _embed_worker(embed_q: queue.Queue, upsert_q: queue.Queue, errors: List[Exception]):
+    """Stage 3: embed records in micro-batches of EMBED_BATCH_SIZE (one of EMBED_WORKERS)."""
+    embed = get_embedding_function()
+    pending = []
+    
+    def flush(count: int):
+        batch = pending[:count]
+        del pending[:count]
+        try:
+            upsert_q.put(list(zip(batch, embed([record[2] for record in batch]))))
+        except Exception as e:
+            errors.append(e)
+    
+    while True:
+        try:
+            item = embed_q.get(timeout=EMBED_IDLE_SECONDS)
+        except queue.Empty:
+            # Upstream is slow; don't hold a partial batch hostage
+            if pending and not errors:
+                flush(len(pending))
+            continue
+        
+        if item is _STAGE_DONE:
+            # Pass the sentinel on so sibling embed workers stop too
+            embed_q.put(_STAGE_DONE)
+            break
+        if errors:
+            continue
+        
+        pending.extend(item)
+        while len(pending) >= EMBED_BATCH_SIZE and not errors:
+            flush(EMBED_BATCH_SIZE)
+    
+    if pending and not errors:
+        flush(len(pending))
+    upsert_q.put(_STAGE_DONE)
+
+
+def _upsert_worker(
+    upsert_q: queue.Queue,
+    progress_q: queue.Queue,
+    collection: chromadb.Collection,
+    timestamp: str,
+    tally: Dict,
+    errors: List[Exception]
+):
+    """Stage 4: coalesce embedded records into UPSERT_BATCH_SIZE writes."""
+    pending = []
+    producers_left = EMBED_WORKERS
+    
+    def flush():
+        try:
+            collection.upsert(
+                ids=[f"{doc_name}_chunk_{i}" for (doc_name, i, _), _ in pending],
+                documents=[chunk for (_, _, chunk), _ in pending],
+                embeddings=[embedding for _, embedding in pending],
+                metadatas=[
+                    {"source": doc_name, "chunk_index": i, "timestamp": timestamp}
+                    for (doc_name, i, _), _ in pending
+                ]
+            )
+        except Exception as e:
+            errors.append(e)
+            return
+        finally:
+            batch = list(pending)
+            pending.clear()
+        
+        # Report each document once all of its chunks are stored
+        with tally['lock']:
+            for (doc_name, _, _), _ in batch:
+                tally['written'][doc_name] = tally['written'].get(doc_name, 0) + 1
+                _report_if_stored(tally, doc_name, progress_q)
+    
+    while True:
+        item = upsert_q.get()
+        if item is _STAGE_DONE:
+            # Finished only when every embed worker has drained
+            producers_left -= 1
+            if producers_left == 0:
+                break
+            continue
+        if errors:
+            continue
+        
+        pending.extend(item)
+        if len(pending) >= UPSERT_BATCH_SIZE:
+            flush()
+    
+    if pending and not errors:
+        flush()
+    progress_q.put(_STAGE_DONE)
+
+
+def _run_index_pipeline(
+    collection: chromadb.Collection,
+    sources: List[Tuple[str, Callable]],
+    progress_callback: Optional[Callable[[int, int, str], None]] = None
+) -> Tuple[Dict[str, int], str]:
+    """
+    Run the load/chunk/embed/upsert pipeline over validated sources.
+    
+    Args:
+        collection: ChromaDB collection
+        sources: List of (doc_name, make_chunks) where make_chunks() returns
+            an iterable of the document's chunks, consumed lazily
+        progress_callback: Optional callback(done, total, doc_name)
+    
+    Returns:
+        Tuple of ({doc_name: chunks_indexed}, timestamp)
+    
+    Raises:
+        VectorStoreError: If any stage fails
+    """
+    timestamp = datetime.now().isoformat()
+    
+    chunk_q = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    embed_q = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    upsert_q = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    progress_q = queue.Queue()
+    tally = {'lock': threading.Lock(), 'expected': {}, 'written': {}}
+    errors = []
+    
+    workers = [
+        threading.Thread(target=_load_worker, args=(sources, chunk_q), daemon=True),
+        threading.Thread(target=_chunk_worker, args=(chunk_q, embed_q, progress_q, tally, errors), daemon=True),
+        *[
+            threading.Thread(target=_embed_worker, args=(embed_q, upsert_q, errors), daemon=True)
+            for _ in range(EMBED_WORKERS)
+        ],
+        threading.Thread(target=_upsert_worker, args=(upsert_q, progress_q, collection, timestamp, tally, errors), daemon=True)
+    ]
+    for worker in workers:
+        worker.start()
+    
+    # Report progress on the calling thread until the upsert stage finishes
+    done = 0
+    while True:
+        doc_name = progress_q.get()
+        if doc_name is _STAGE_DONE:
+            break
+        done += 1
+        if progress_callback:
+            progress_callback(done, len(sources), doc_name)
+    
+    for worker in workers:
+        worker.join()
+    
+    if not errors:
+        counts = {doc_name: tally['expected'][doc_name] for doc_name, _ in sources}
+        try:
+            _drop_stale_chunks(collection, counts)
+        except Exception as e:
+            errors.append(e)
+    
+    # Any write, even a partial one, makes cached retrievals stale
+    _clear_query_cache()
+    
+    if errors:
+        raise VectorStoreError(f"Batch indexing failed: {str(errors[0])}")
+    
+    return counts, timestamp
+
+
+def _batch_result(counts: Dict[str, int], skipped: List[Dict], timestamp: str) -> Dict:
+    """Shape pipeline output into the batch indexing result dict."""
+    return {
+        "success": True,
+        "results": [
+            {"document": doc_name, "chunks_indexed": n}
+            for doc_name, n in counts.items()
+        ],
+        "skipped": skipped,
+        "chunks_indexed": sum(counts.values()),
+        "timestamp": timestamp
+    }
+
+
+def batch_index_documents(
+    collection: chromadb.Collection,
+    docs: List[Tuple[str, str]],
+    config: Dict,
+    progress_callback: Optional[Callable[[int, int, str], None]] = None
+) -> Dict:
+    """
+    Index several documents through a pipelined load/chunk/embed/upsert flow.
+    
+    Each stage runs on its own thread, connected by bounded queues, so
+    chunking overlaps embedding, embedding runs in micro-batches and writes
+    are coalesced into large collection.upsert() calls.
+    
+    Args:
+        collection: ChromaDB collection
+        docs: List of (doc_name, text) tuples
+        config: Configuration dict
+        progress_callback: Optional callback(done, total, doc_name), invoked
+            on the calling thread as each document is fully stored
+    
+    Returns:
+        Result dict with per-document results and skipped documents
+    
+    Raises:
+        VectorStoreError: If indexing fails
+    """
+    chunk_size = config.get('chunk_size', 800)
+    overlap = config.get('chunk_overlap', 200)
+    
+    sources = []
+    skipped = []
+    for doc_name, text in docs:
+        is_valid, error_msg = validate_text_input(text)
+        if is_valid:
+            sources.append((doc_name, partial(chunk_text, text, chunk_size, overlap)))
+        else:
+            skipped.append({"document": doc_name, "error": f"Invalid input: {error_msg}"})
+    
+    counts, timestamp = _run_index_pipeline(collection, sources, progress_callback)
+    return _batch_result(counts, skipped, timestamp)
+
+
+def batch_index_files(
+    collection: chromadb.Collection,
+    files: List[Tuple[str, str]],
+    config: Dict,
+    progress_callback: Optional[Callable[[int, int, str], None]] = None
+) -> Dict:
+    """
+    Index several text files, streaming each from disk into the pipeline.
+    
+    Like batch_index_documents(), but takes file paths so document text
+    never has to be held in memory by the caller.
+    
+    Args:
+        collection: ChromaDB collection
+        files: List of (doc_name, file_path) tuples
+        config: Configuration dict
+        progress_callback: Optional callback(done, total, doc_name), invoked
+            on the calling thread as each document is fully stored
+    
+    Returns:
+        Result dict with per-document results and skipped documents
+    
+    Raises:
+        VectorStoreError: If indexing fails
+    """
+    chunk_size = config.get('chunk_size', 800)
+    overlap = config.get('chunk_overlap', 200)
+    
+    sources = []
+    skipped = []
+    for doc_name, path in files:
+        is_valid, error_msg = validate_text_file(path)
+        if is_valid:
+            sources.append((doc_name, partial(iter_file_chunks, path, chunk_size, overlap)))
+        else:
+            skipped.append({"document": doc_name, "error": f"Invalid input: {error_msg}"})
+    
+    counts, timestamp = _run_index_pipeline(collection, sources, progress_callback)
+    return _batch_result(counts, skipped, timestamp)
+
+
+def remove_documents(collection: chromadb.Collection, doc_names: List[str]):
+    """
+    Delete every chunk of the named documents from the vector store.
+    
+    Args:
+        collection: ChromaDB collection
+        doc_names: Document identifiers as passed to indexing
+    
+    Raises:
+        VectorStoreError: If the delete fails
+    """
+    if not doc_names:
+        return
+    
+    try:
+        collection.delete(where={"source": {"$in": list(doc_names)}})
+    except Exception as e:
+        raise VectorStoreError(f"Delete failed: {str(e)}")
+    finally:
+        _clear_query_cache()
+
+
+# Retrieval cache: workflow tasks often repeat the same prompt, and each
+# uncached query costs a query embedding plus an HNSW search. Indexing clears it.
+QUERY_CACHE_TTL = 600  # Seconds
+QUERY_CACHE_SIZE = 256
+
+_query_cache: "OrderedDict[Tuple[str, str, int], Tuple[float, List[Dict]]]" = OrderedDict()
+_query_cache_lock = threading.Lock()
+_query_cache_generation = 0  # Bumped on every clear
+
+
+def _clear_query_cache():
+    """Drop cached retrievals once the collection contents change."""
+    global _query_cache_generation
+    with _query_cache_lock:
+        _query_cache.clear()
+        _query_cache_generation += 1
 
 
 def query_vector_store(
@@ -246,6 +759,9 @@ def query_vector_store(
     """
     Query vector store with error handling.
     
+    Identical queries against an unchanged collection are served from
+    an in-process cache for up to QUERY_CACHE_TTL seconds.
+    
     Args:
         collection: ChromaDB collection
         query: Search query
@@ -257,10 +773,21 @@ def query_vector_store(
     Raises:
         VectorStoreError: If query fails
     """
+    n_results = min(top_k, 10)  # Cap at 10 for safety
+    key = (collection.name, query, n_results)
+    now = time.time()
+    
+    with _query_cache_lock:
+        hit = _query_cache.get(key)
+        if hit is not None and now - hit[0] < QUERY_CACHE_TTL:
+            _query_cache.move_to_end(key)
+            return copy.deepcopy(hit[1])
+        generation = _query_cache_generation
+    
     try:
         results = collection.query(
             query_texts=[query],
-            n_results=min(top_k, 10)  # Cap at 10 for safety
+            n_results=n_results
         )
         
         retrieved = []
@@ -271,10 +798,18 @@ def query_vector_store(
                 'metadata': results['metadatas'][0][i] if results.get('metadatas') else {}
             })
         
-        return retrieved
-        
     except Exception as e:
         raise VectorStoreError(f"Query failed: {str(e)}")
+    
+    with _query_cache_lock:
+        # Skip storing results that an index write may have overtaken
+        if generation == _query_cache_generation:
+            _query_cache[key] = (now, copy.deepcopy(retrieved))
+            _query_cache.move_to_end(key)
+            while len(_query_cache) > QUERY_CACHE_SIZE:
+                _query_cache.popitem(last=False)
+    
+    return retrieved
 
 
 # ============================================================================
@@ -337,10 +872,9 @@ def execute_tool_call(
         Tool execution result as string
     """
     if tool_name == "query_project_documents":
-        
-        print("tool call is running")
         query = tool_arguments.get("query", "")
         top_k = tool_arguments.get("top_k", 5)
+        logger.debug("tool call %s: query=%r top_k=%s", tool_name, query, top_k)
         
         # Execute the query
         results = query_vector_store(collection, query, top_k)
@@ -391,6 +925,30 @@ def clean_json_response(response: str) -> str:
     
     return response
 
+# Connections kept alive per host; covers MAX_PARALLEL_TASKS plus tool-call rounds
+HTTP_POOL_SIZE = 8
+
+
+@lru_cache(maxsize=None)
+def _get_http_session():
+    """
+    Get the shared HTTP session used for OpenRouter calls.
+    
+    Reusing pooled keep-alive connections skips the TCP/TLS handshake on
+    every request, which adds up when workflow tasks run concurrently.
+    
+    Returns:
+        requests.Session with a connection pool of HTTP_POOL_SIZE
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    return session
+
+
 def call_openrouter_with_retry(
     prompt: str,
     api_key: str,
@@ -457,7 +1015,7 @@ CRITICAL FORMATTING INSTRUCTIONS:
             if tools:
                 payload["tools"] = tools
             
-            response = requests.post(
+            response = _get_http_session().post(
                 "https://openrouter.ai/api/v1/chat/completions",
                 headers=headers,
                 json=payload,
@@ -586,6 +1144,9 @@ def validate_workflow_json(workflow: Dict) -> Tuple[bool, Optional[str]]:
         
         if task['output_format'] not in ['markdown', 'csv']:
             return False, f"Task {i+1} has invalid output_format (must be 'markdown' or 'csv')"
+        
+        if 'depends_on' in task and not isinstance(task['depends_on'], list):
+            return False, f"Task {i+1} has invalid depends_on (must be a list of task_ids)"
     
     return True, None
 
@@ -645,6 +1206,7 @@ CRITICAL: Return ONLY valid JSON, no other text. Use this exact structure:
 IMPORTANT:
 - Output_format must be either "markdown" or "csv"
 - Each task prompt should clearly reference project context
+- Optionally add "depends_on": [task_ids] to a task that only needs specific earlier outputs; omit it to build on all previous tasks
 - Start your response with {{ and end with }}
 - Do NOT wrap in markdown code blocks"""
     
@@ -674,22 +1236,97 @@ IMPORTANT:
     
     return workflow
 
+# Semantic cache for AI-generated workflows: a goal whose embedding is this
+# close to a cached one (same model, same retrieved context) reuses its workflow
+SEMANTIC_CACHE_THRESHOLD = 0.95
+SEMANTIC_CACHE_TTL = 3600  # Seconds
+SEMANTIC_CACHE_SIZE = 32
+
+_workflow_cache: List[Dict] = []  # Most recent entry last
+_workflow_cache_lock = threading.Lock()
+
+
+def _cosine_similarity(a, b) -> float:
+    """Cosine similarity of two equal-length vectors."""
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def _lookup_cached_workflow(scope: str, goal_vector) -> Optional[Dict]:
+    """
+    Find a cached workflow for a semantically similar goal.
+    
+    Args:
+        scope: Exact-match key (model + retrieved context digest)
+        goal_vector: Embedding of the workflow goal
+    
+    Returns:
+        Copy of the best matching workflow, or None
+    """
+    now = time.time()
+    with _workflow_cache_lock:
+        _workflow_cache[:] = [e for e in _workflow_cache if now - e['created'] < SEMANTIC_CACHE_TTL]
+        
+        best, best_score = None, SEMANTIC_CACHE_THRESHOLD
+        for entry in _workflow_cache:
+            if entry['scope'] != scope:
+                continue
+            score = _cosine_similarity(goal_vector, entry['vector'])
+            if score >= best_score:
+                best, best_score = entry, score
+        
+        if best is None:
+            return None
+        
+        # Refresh recency so hot entries survive eviction
+        _workflow_cache.remove(best)
+        _workflow_cache.append(best)
+        return copy.deepcopy(best['workflow'])
+
+
+def _store_cached_workflow(scope: str, goal_vector, workflow: Dict):
+    """Remember a validated workflow, evicting the least recently used entry."""
+    with _workflow_cache_lock:
+        _workflow_cache.append({
+            'scope': scope,
+            'vector': list(goal_vector),
+            'workflow': copy.deepcopy(workflow),
+            'created': time.time()
+        })
+        del _workflow_cache[:-SEMANTIC_CACHE_SIZE]
+
+
+def clear_workflow_cache():
+    """Drop all cached AI workflows (e.g. after the indexed documents change)."""
+    with _workflow_cache_lock:
+        _workflow_cache.clear()
+
+
 def generate_workflow_from_ai_with_goal(
     collection: chromadb.Collection,
     api_key: str,
     model: str,
     config: Dict,
-    workflow_goal: str
+    workflow_goal: str,
+    progress_callback: Optional[Callable[[str, float], None]] = None,
+    use_cache: bool = True
 ) -> Dict:
     """
     Generate workflow using AI with specific user goal.
     
+    A semantically similar goal over the same retrieved context and model
+    returns the cached workflow without calling the AI.
+    
     Args:
         collection: Vector store with indexed document
         api_key: API key
         model: Model name
         config: Configuration
         workflow_goal: User-specified workflow goal/objective
+        progress_callback: Optional callback(stage, fraction) fired as each
+            stage starts: "retrieving", "sending", "parsing", "done"
+        use_cache: Reuse a cached workflow for a similar goal, if any
     
     Returns:
         Validated workflow dict
@@ -698,13 +1335,26 @@ def generate_workflow_from_ai_with_goal(
         AIError: If generation fails
         ValueError: If workflow is invalid
     """
+    def report(stage: str, fraction: float):
+        if progress_callback:
+            progress_callback(stage, fraction)
     
     # Retrieve context
+    report("retrieving", 0.1)
     context_chunks = query_vector_store(collection, 
         "project specification requirements objectives", top_k=10)
     
     context = "\n\n---\n\n".join([chunk['text'] for chunk in context_chunks])
     
+    # Check the semantic cache before paying for an AI call
+    cache_scope = hashlib.blake2b(f"{model}\n{context}".encode('utf-8'), digest_size=16).hexdigest()
+    goal_vector = get_embedding_function()([workflow_goal])[0]
+    if use_cache:
+        cached = _lookup_cached_workflow(cache_scope, goal_vector)
+        if cached is not None:
+            report("done", 1.0)
+            return cached
+    
     # Enhanced prompt with user goal
     prompt = f"""Based on the following project specification, generate a workflow JSON that breaks down into discrete AI tasks.
 
@@ -742,12 +1392,14 @@ CRITICAL: Return ONLY valid JSON, no other text. Use this exact format:
 IMPORTANT:
 - Output_format must be either "markdown" or "csv"
 - Each task prompt should clearly reference project context
+- Optionally add "depends_on": [task_ids] to a task that only needs specific earlier outputs; omit it to build on all previous tasks
 - Start your response with {{ and end with }}
 - Do NOT wrap in markdown code blocks"""
     
     # Call AI with tool support
     tools = [get_chromadb_query_tool()]
     
+    report("sending", 0.3)
     response = call_openrouter_with_retry(
         prompt=prompt,
         api_key=api_key,
@@ -759,6 +1411,7 @@ IMPORTANT:
     )
     
     # Parse and validate
+    report("parsing", 0.85)
     try:
         workflow = json.loads(response)
     except json.JSONDecodeError as e:
@@ -768,6 +1421,9 @@ IMPORTANT:
     if not is_valid:
         raise ValueError(f"Invalid workflow structure: {error_msg}")
     
+    _store_cached_workflow(cache_scope, goal_vector, workflow)
+    
+    report("done", 1.0)
     return workflow
 
 def generate_workflow_from_template(
@@ -875,6 +1531,159 @@ Provide detailed output in {task['output_format']} format."""
         return False, str(e), "UNKNOWN_ERROR"
 
 
+@dataclass(slots=True)
+class TaskResult:
+    """Outcome of one executed workflow task, kept in session state."""
+    idx: int
+    ok: bool
+    output: Optional[str] = None  # Output file path when ok
+    error: Optional[str] = None
+    error_type: Optional[str] = None
+    previous_outputs: List[str] = field(default_factory=list)  # Context reused on retry
+
+
+# Upper bound on concurrent LLM calls while executing a workflow
+MAX_PARALLEL_TASKS = 4
+
+
+def resolve_task_dependencies(tasks: List[Dict]) -> List[List[int]]:
+    """
+    Resolve each task's dependencies to indices of earlier tasks.
+    
+    Tasks may declare "depends_on" as a list of task_ids. Tasks without it
+    depend on ALL previous tasks, preserving the cumulative context strategy.
+    References to unknown or later tasks are ignored so the graph stays acyclic.
+    
+    Args:
+        tasks: Workflow task list
+    
+    Returns:
+        List of dependency index lists, one per task
+    """
+    index_by_id = {str(task['task_id']): i for i, task in enumerate(tasks)}
+    
+    dependencies = []
+    for i, task in enumerate(tasks):
+        if 'depends_on' in task:
+            deps = sorted({
+                index_by_id[str(dep)] for dep in task['depends_on']
+                if str(dep) in index_by_id and index_by_id[str(dep)] < i
+            })
+        else:
+            deps = list(range(i))
+        dependencies.append(deps)
+    
+    return dependencies
+
+
+def critical_path_length(tasks: List[Dict]) -> int:
+    """
+    Number of tasks on the longest dependency chain.
+    
+    This is how many task latencies a run takes end to end when enough
+    workers are available.
+    
+    Args:
+        tasks: Workflow task list
+    
+    Returns:
+        Longest chain length (0 for no tasks)
+    """
+    depth = []
+    for deps in resolve_task_dependencies(tasks):
+        depth.append(1 + max((depth[dep] for dep in deps), default=0))
+    return max(depth, default=0)
+
+
+def run_workflow_tasks(
+    tasks: List[Dict],
+    collection: chromadb.Collection,
+    api_key: str,
+    model: str,
+    config: Dict,
+    max_workers: Optional[int] = None,
+    should_stop: Optional[Callable[[], bool]] = None
+):
+    """
+    Execute workflow tasks concurrently as soon as their dependencies finish.
+    
+    A task is submitted once every task it depends on has finished; failed
+    dependencies simply contribute no output, as in sequential execution.
+    Wall time drops from the sum of task latencies to the critical path.
+    
+    At most max_workers tasks are in flight, so stopping (should_stop()
+    turning true, or closing the generator) never leaves paid calls queued.
+    
+    Args:
+        tasks: Workflow task list
+        collection: Vector store
+        api_key: API key
+        model: Model name
+        config: Configuration
+        max_workers: Maximum concurrent tasks (default: config's
+            max_parallel_tasks, else MAX_PARALLEL_TASKS)
+        should_stop: Optional callable checked before each submission;
+            once it returns True no further tasks are started
+    
+    Yields:
+        Tuples of (task_index, success, result_or_error, error_type,
+        previous_outputs) in completion order
+    """
+    if max_workers is None:
+        max_workers = config.get('max_parallel_tasks') or MAX_PARALLEL_TASKS
+    
+    dependencies = resolve_task_dependencies(tasks)
+    waiting_on = [set(deps) for deps in dependencies]
+    dependents = [[] for _ in tasks]
+    for i, deps in enumerate(dependencies):
+        for dep in deps:
+            dependents[dep].append(i)
+    
+    outputs = {}
+    ready = deque(i for i, deps in enumerate(waiting_on) if not deps)
+    futures = {}
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    
+    def fill():
+        # Submit only up to the worker count; the rest wait in `ready`
+        while ready and len(futures) < max_workers:
+            if should_stop and should_stop():
+                ready.clear()
+                return
+            i = ready.popleft()
+            previous_outputs = [outputs[dep] for dep in dependencies[i] if dep in outputs]
+            future = executor.submit(
+                execute_task_safe, tasks[i], collection, api_key, model, config, previous_outputs
+            )
+            futures[future] = (i, previous_outputs)
+    
+    try:
+        fill()
+        while futures:
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            
+            for future in finished:
+                i, previous_outputs = futures.pop(future)
+                success, result, error_type = future.result()
+                
+                if success:
+                    outputs[i] = f"[Task {tasks[i]['task_id']}]\n{result}"
+                
+                # Release tasks that were only waiting on this one
+                for dependent in dependents[i]:
+                    waiting_on[dependent].discard(i)
+                    if not waiting_on[dependent]:
+                        ready.append(dependent)
+                
+                yield i, success, result, error_type, previous_outputs
+            
+            fill()
+    finally:
+        # Runs on normal exit and on GeneratorExit; in-flight calls finish
+        # in the background, nothing queued is started
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
 # ============================================================================
 # WORKFLOW HISTORY
 # ============================================================================
@@ -909,9 +1718,26 @@ def save_workflow_history(workflow: Dict, output_files: List[str]) -> str:
     return history_file
 
 
-def list_workflow_history() -> List[Dict]:
+def count_workflow_history() -> int:
+    """
+    Count saved workflow history files without parsing them.
+    
+    Returns:
+        Number of history files
+    """
+    if not os.path.exists("history"):
+        return 0
+    
+    return sum(1 for f in os.listdir("history") if f.endswith('.json'))
+
+
+def list_workflow_history(limit: Optional[int] = None) -> List[Dict]:
     """
-    List all workflow execution history.
+    List workflow execution history, newest first.
+    
+    Args:
+        limit: Stop after this many entries; each entry parses a full
+            history file, so callers showing a few should pass a limit
     
     Returns:
         List of history metadata
@@ -923,6 +1749,8 @@ def list_workflow_history() -> List[Dict]:
     history_list = []
     
     for filename in sorted(history_files, reverse=True):
+        if limit is not None and len(history_list) >= limit:
+            break
         try:
             with open(f"history/{filename}", 'r', encoding='utf-8') as f:
                 data = json.load(f)
@@ -942,7 +1770,12 @@ def list_workflow_history() -> List[Dict]:
 # FILE OUTPUT WITH VERSIONING
 # ============================================================================
 
-def save_output(content: str, task_name: str, output_format: str) -> str:
+def save_output(
+    content: str,
+    task_name: str,
+    output_format: str,
+    date_str: Optional[str] = None
+) -> str:
     """
     Save output with automatic versioning if file exists.
     
@@ -950,28 +1783,37 @@ def save_output(content: str, task_name: str, output_format: str) -> str:
         content: Output content
         task_name: Task identifier
         output_format: File format
+        date_str: YYYY-MM-DD file name prefix (default: today); pass one
+            value for every output of a run
     
     Returns:
         File path
     """
     os.makedirs("outputs", exist_ok=True)
     
-    date_str = datetime.now().strftime("%Y-%m-%d")
+    if date_str is None:
+        date_str = datetime.now().strftime("%Y-%m-%d")
     ext = "md" if output_format == "markdown" else "csv"
     
-    # Check for existing files and increment version
+    # One directory listing instead of an exists() probe per earlier revision
+    prefix = f"{date_str}-{task_name}-rev"
+    taken = {name for name in os.listdir("outputs") if name.startswith(prefix)}
+    
     version = 0
     while True:
-        filename = f"{date_str}-{task_name}-rev{version}.{ext}"
+        filename = f"{prefix}{version}.{ext}"
+        if filename in taken:
+            version += 1
+            continue
+        
         filepath = os.path.join("outputs", filename)
-        if not os.path.exists(filepath):
-            break
-        version += 1
-    
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(content)
-    
-    return filepath
+        try:
+            # Exclusive create: concurrent tasks never overwrite each other's revision
+            with open(filepath, 'x', encoding='utf-8') as f:
+                f.write(content)
+            return filepath
+        except FileExistsError:
+            version += 1
 
 
 # Export all public functions
@@ -981,15 +1823,27 @@ __all__ = [
     'AIError',
     'load_env_config',
     'initialize_vector_store',
+    'get_embedding_function',
     'validate_text_input',
+    'validate_text_file',
+    'iter_file_chunks',
     'index_document',
+    'batch_index_documents',
+    'batch_index_files',
+    'remove_documents',
     'query_vector_store',
     'validate_workflow_json',
     'generate_workflow_from_ai',
     'generate_workflow_from_ai_with_goal',
+    'clear_workflow_cache',
     'generate_workflow_from_template',
     'execute_task_safe',
+    'resolve_task_dependencies',
+    'critical_path_length',
+    'run_workflow_tasks',
+    'TaskResult',
     'save_workflow_history',
     'list_workflow_history',
+    'count_workflow_history',
     'save_output'
 ]
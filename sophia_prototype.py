@@ -16,29 +16,36 @@ Dependencies:
 
 import os
 import json
+import hashlib
+import shelve
+import threading
+import time
 from datetime import datetime
 from typing import List, Dict, Optional
 from dotenv import load_dotenv
 import chromadb
-from chromadb.config import Settings
 
 
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 
-def load_env_config() -> Dict[str, str]:
+def load_env_config() -> Dict:
     """
     Load configuration from .env file.
     
     Returns:
-        Dict with api_key and model name
+        Dict with api_key, model name and max_parallel_tasks (None when
+        MAX_PARALLEL_TASKS is unset, leaving the cap to the caller)
     """
     load_dotenv()
     
+    max_parallel_tasks = os.getenv('MAX_PARALLEL_TASKS')
+    
     config = {
         'api_key': os.getenv('OPENROUTER_API_KEY', ''),
-        'model': os.getenv('OPENROUTER_MODEL', 'anthropic/claude-3.5-sonnet')
+        'model': os.getenv('OPENROUTER_MODEL', 'anthropic/claude-3.5-sonnet'),
+        'max_parallel_tasks': int(max_parallel_tasks) if max_parallel_tasks else None
     }
     
     if not config['api_key']:
@@ -84,54 +91,79 @@ def chunk_text(text: str, chunk_size: int = 800, overlap: int = 200) -> List[str
     Returns:
         List of text chunks
     """
-    chunks = []
-    start = 0
+    # Chunk starts advance by chunk_size - overlap
+    chunks = (text[start:start + chunk_size] for start in range(0, len(text), chunk_size - overlap))
     
-    while start < len(text):
-        end = start + chunk_size
-        chunk = text[start:end]
-        
-        # Don't add empty chunks
-        if chunk.strip():
-            chunks.append(chunk)
-        
-        # Move start position (chunk_size - overlap for next iteration)
-        start += (chunk_size - overlap)
-    
-    return chunks
+    # Don't add whitespace-only chunks (slices are never empty)
+    return [chunk for chunk in chunks if not chunk.isspace()]
 
 
-def index_document(collection: chromadb.Collection, text: str, doc_name: str) -> Dict:
+def iter_file_chunks(
+    path: str,
+    chunk_size: int = 800,
+    overlap: int = 200,
+    read_size: int = 1 << 16
+):
     """
-    Index document in vector store with chunking.
+    Stream overlapping chunks from a text file without loading it whole.
+    
+    Produces exactly the same chunks as chunk_text() on the full file
+    contents, but only holds roughly one read block in memory.
     
     Args:
-        collection: ChromaDB collection
-        text: Document text content
-        doc_name: Document identifier
+        path: Path to a UTF-8 text file
+        chunk_size: Size of each chunk (default: 800)
+        overlap: Overlap between chunks (default: 200)
+        read_size: Characters read from disk per block
     
-    Returns:
-        Dict with success status and chunk count
+    Yields:
+        Text chunks
     """
-    # Clear previous document if exists
-    existing_ids = collection.get(where={"source": doc_name})["ids"]
-    if existing_ids:
-        collection.delete(ids=existing_ids)
-    
-    # Chunk the document
-    chunks = chunk_text(text)
-    
+    step = chunk_size - overlap
+    buffer = ""
+    pos = 0
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            block = f.read(read_size)
+            if not block:
+                break
+            
+            # Drop consumed text before appending the next block
+            buffer = buffer[pos:] + block
+            pos = 0
+            
+            # A chunk is final once a full chunk_size is buffered
+            while len(buffer) - pos >= chunk_size:
+                chunk = buffer[pos:pos + chunk_size]
+                if not chunk.isspace():
+                    yield chunk
+                pos += step
+    
+    # Flush the tail, mirroring chunk_text's `while start < len(text)`
+    while pos < len(buffer):
+        chunk = buffer[pos:pos + chunk_size]
+        if not chunk.isspace():
+            yield chunk
+        pos += step
+
+
+def _add_chunks(collection: chromadb.Collection, chunks: List[str], doc_name: str) -> Dict:
+    """Replace any previous copy of doc_name in the store with chunks."""
     # Prepare data for ChromaDB
     ids = [f"{doc_name}_chunk_{i}" for i in range(len(chunks))]
     metadatas = [{"source": doc_name, "chunk_index": i} for i in range(len(chunks))]
     
-    # Add to vector store
-    collection.add(
+    # Ids are deterministic, so upsert replaces a previous copy in place
+    collection.upsert(
         documents=chunks,
         metadatas=metadatas,
         ids=ids
     )
     
+    # Drop trailing chunks from a longer previous copy
+    collection.delete(where={"$and": [{"source": doc_name}, {"chunk_index": {"$gte": len(chunks)}}]})
+    
     return {
         "success": True,
         "chunks_indexed": len(chunks),
@@ -139,6 +171,36 @@ def index_document(collection: chromadb.Collection, text: str, doc_name: str) ->
     }
 
 
+def index_document(collection: chromadb.Collection, text: str, doc_name: str) -> Dict:
+    """
+    Index document in vector store with chunking.
+    
+    Args:
+        collection: ChromaDB collection
+        text: Document text content
+        doc_name: Document identifier
+    
+    Returns:
+        Dict with success status and chunk count
+    """
+    return _add_chunks(collection, chunk_text(text), doc_name)
+
+
+def index_document_file(collection: chromadb.Collection, path: str, doc_name: str) -> Dict:
+    """
+    Index a document straight from disk, streaming it through the chunker.
+    
+    Args:
+        collection: ChromaDB collection
+        path: Path to the document text file
+        doc_name: Document identifier
+    
+    Returns:
+        Dict with success status and chunk count
+    """
+    return _add_chunks(collection, list(iter_file_chunks(path)), doc_name)
+
+
 def query_vector_store(
     collection: chromadb.Collection, 
     query: str, 
@@ -290,7 +352,8 @@ Return ONLY valid JSON in this exact format:
   ]
 }}
 
-Ensure each task prompt is self-contained and references the project specification context."""
+Ensure each task prompt is self-contained and references the project specification context.
+Optionally add "depends_on": [task_ids] to a task that only needs specific earlier outputs; omit it to build on all previous tasks."""
     
     # Call AI
     response = call_openrouter(prompt, api_key, model, response_format="json")
@@ -305,28 +368,129 @@ Ensure each task prompt is self-contained and references the project specificati
 # TASK EXECUTION
 # ============================================================================
 
+# On-disk memo of task results, keyed by hash of (model, final prompt);
+# TASK_CACHE_PATH in .env overrides the location
+TASK_CACHE_PATH = ".sophia_cache"
+_task_cache_lock = threading.Lock()
+
+
+def _task_cache_path() -> str:
+    """Resolve the shelve path at call time so .env values loaded later apply."""
+    return os.getenv('TASK_CACHE_PATH', TASK_CACHE_PATH)
+
+
+def _task_cache_key(model: str, final_prompt: str) -> str:
+    """Build a stable cache key for a fully assembled task prompt."""
+    return hashlib.sha256(f"{model}|{final_prompt}".encode('utf-8')).hexdigest()
+
+
+def _cache_get(key: str) -> Optional[str]:
+    """Return a cached value, or None on a miss."""
+    with _task_cache_lock, shelve.open(_task_cache_path()) as cache:
+        entry = cache.get(key)
+    return entry[1] if entry else None
+
+
+def _cache_put(key: str, value: str):
+    """Store a value with its creation time (used by prune_task_cache)."""
+    with _task_cache_lock, shelve.open(_task_cache_path()) as cache:
+        cache[key] = (time.time(), value)
+
+
+def prune_task_cache(max_age_days: float = 7) -> int:
+    """
+    Drop task cache entries older than max_age_days.
+    
+    Args:
+        max_age_days: Maximum entry age in days
+    
+    Returns:
+        Number of entries removed
+    """
+    cutoff = time.time() - max_age_days * 86400
+    
+    with _task_cache_lock, shelve.open(_task_cache_path()) as cache:
+        stale = [key for key, (created, _) in cache.items() if created < cutoff]
+        for key in stale:
+            del cache[key]
+    
+    return len(stale)
+
+
+# Bounded cumulative context: long outputs are summarized and only the
+# most recent outputs are forwarded, so prompt size stays O(K) per task
+SUMMARY_THRESHOLD_CHARS = 2000
+MAX_PREVIOUS_OUTPUTS = 10
+
+
+def condense_output(result: str, api_key: str, model: str) -> str:
+    """
+    Condense a task output before it is passed on as previous context.
+    
+    Outputs up to SUMMARY_THRESHOLD_CHARS are returned unchanged; longer ones
+    are replaced with a ~200 token AI summary, cached by sha256 of the output.
+    If summarization fails the output is truncated instead.
+    
+    Args:
+        result: Full task output
+        api_key: API key
+        model: Model name
+    
+    Returns:
+        Output text suitable for PREVIOUS TASK OUTPUTS
+    """
+    if len(result) <= SUMMARY_THRESHOLD_CHARS:
+        return result
+    
+    cache_key = "summary:" + hashlib.sha256(result.encode('utf-8')).hexdigest()
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return cached
+    
+    prompt = f"""Summarize the following project planning output in at most 200 tokens.
+Keep concrete facts (names, numbers, dates, decisions) that later planning tasks may depend on.
+
+{result}"""
+    
+    try:
+        summary = call_openrouter(prompt, api_key, model)
+    except Exception:
+        return result[:SUMMARY_THRESHOLD_CHARS] + "\n\n[Output truncated]"
+    
+    _cache_put(cache_key, summary)
+    
+    return summary
+
+
 def execute_task(
     task: Dict,
     collection: chromadb.Collection,
     api_key: str,
     model: str,
-    previous_outputs: List[str]
+    previous_outputs: List[str],
+    use_cache: bool = True
 ) -> str:
     """
     Execute a single workflow task with cumulative context.
     
     Context Assembly Strategy (CRITICAL):
     1. Retrieve top 5 most relevant chunks from vector store
-    2. Include ALL previous task outputs (cumulative learning)
+    2. Include the last MAX_PREVIOUS_OUTPUTS previous outputs (cumulative
+       learning); callers pass them through condense_output() first
     3. Order: Most relevant chunks first, then previous outputs
     4. Monitor token count (~6000 token limit = ~24,000 chars)
     
+    Results are memoized on disk by (model, assembled prompt), so reruns
+    with unchanged context are served without an API call. Pass
+    use_cache=False to force a fresh call (the new result is still stored).
+    
     Args:
         task: Task dict with prompt and metadata
         collection: Vector store
         api_key: API key
         model: Model name
-        previous_outputs: List of previous task results
+        previous_outputs: List of previous (condensed) task results
+        use_cache: Serve a memoized result when one exists
     
     Returns:
         Task output text
@@ -348,9 +512,9 @@ def execute_task(
     spec_context = "\n\n".join([chunk['text'] for chunk in context_chunks])
     context_parts.append(f"PROJECT SPECIFICATION CONTEXT:\n{spec_context}")
     
-    # 2. Previous task outputs (cumulative learning)
+    # 2. Previous task outputs (cumulative learning, bounded window)
     if previous_outputs:
-        prev_context = "\n\n---\n\n".join(previous_outputs)
+        prev_context = "\n\n---\n\n".join(previous_outputs[-MAX_PREVIOUS_OUTPUTS:])
         context_parts.append(f"PREVIOUS TASK OUTPUTS:\n{prev_context}")
     
     # Combine all context
@@ -368,12 +532,74 @@ def execute_task(
 
 Provide a detailed, well-structured response in {task['output_format']} format."""
     
+    # Identical (model, prompt, context) never hits the API twice
+    cache_key = _task_cache_key(model, final_prompt)
+    if use_cache:
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            return cached
+    
     # Execute task
     result = call_openrouter(final_prompt, api_key, model)
     
+    _cache_put(cache_key, result)
+    
     return result
 
 
+def resolve_task_dependencies(tasks: List[Dict]) -> List[List[int]]:
+    """
+    Resolve each task's dependencies to indices of earlier tasks.
+    
+    Tasks may declare "depends_on" as a list of task_ids. Tasks without it
+    depend on ALL previous tasks, preserving the cumulative context strategy.
+    References to unknown or later tasks are ignored so the graph stays acyclic.
+    
+    Args:
+        tasks: Workflow task list
+    
+    Returns:
+        List of dependency index lists, one per task
+    """
+    index_by_id = {str(task['task_id']): i for i, task in enumerate(tasks)}
+    
+    dependencies = []
+    for i, task in enumerate(tasks):
+        if 'depends_on' in task:
+            deps = sorted({
+                index_by_id[str(dep)] for dep in task['depends_on']
+                if str(dep) in index_by_id and index_by_id[str(dep)] < i
+            })
+        else:
+            deps = list(range(i))
+        dependencies.append(deps)
+    
+    return dependencies
+
+
+def build_execution_layers(tasks: List[Dict]) -> List[List[int]]:
+    """
+    Group tasks into layers whose members can execute concurrently.
+    
+    Every task in a layer only depends on tasks from earlier layers.
+    
+    Args:
+        tasks: Workflow task list
+    
+    Returns:
+        List of layers, each a list of task indices in workflow order
+    """
+    levels = []
+    for deps in resolve_task_dependencies(tasks):
+        levels.append(max((levels[d] for d in deps), default=-1) + 1)
+    
+    layers = [[] for _ in range(max(levels, default=-1) + 1)]
+    for i, level in enumerate(levels):
+        layers[level].append(i)
+    
+    return layers
+
+
 def execute_workflow(
     workflow: Dict,
     collection: chromadb.Collection,
@@ -385,7 +611,7 @@ def execute_workflow(
     
     Each task sees:
     - Relevant chunks from original document
-    - ALL outputs from previous tasks (builds on previous work)
+    - Condensed outputs from recent previous tasks (builds on previous work)
     
     Args:
         workflow: Workflow JSON dict
@@ -403,7 +629,9 @@ def execute_workflow(
     print(f"Executing Workflow: {workflow['workflow_name']}")
     print(f"{'='*60}\n")
     
-    for task in workflow['tasks']:
+    last_index = len(workflow['tasks']) - 1
+    
+    for i, task in enumerate(workflow['tasks']):
         task_id = task['task_id']
         task_name = task['name']
         
@@ -426,7 +654,11 @@ def execute_workflow(
         )
         
         output_files.append(output_path)
-        previous_outputs.append(f"[Task {task_id}: {task_name}]\n{result}")
+        
+        # Nothing reads the last output as context, so skip its summary call
+        if i < last_index:
+            previous_outputs.append(f"[Task {task_id}: {task_name}]\n{condense_output(result, api_key, model)}")
+            del previous_outputs[:-MAX_PREVIOUS_OUTPUTS]
         
         print(f"[Task {task_id}] ✓ Complete. Saved to: {output_path}\n")
     
@@ -441,7 +673,12 @@ def execute_workflow(
 # FILE OUTPUT
 # ============================================================================
 
-def save_output(content: str, task_name: str, output_format: str) -> str:
+def save_output(
+    content: str,
+    task_name: str,
+    output_format: str,
+    output_dir: str = "outputs"
+) -> str:
     """
     Save task output to file with date-stamped naming.
     
@@ -451,18 +688,19 @@ def save_output(content: str, task_name: str, output_format: str) -> str:
         content: Output content
         task_name: Task identifier
         output_format: 'markdown' or 'csv'
+        output_dir: Target directory (default: outputs)
     
     Returns:
         File path
     """
     # Create outputs directory if needed
-    os.makedirs("outputs", exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
     
     # Generate filename
     date_str = datetime.now().strftime("%Y-%m-%d")
     ext = "md" if output_format == "markdown" else "csv"
     filename = f"{date_str}-{task_name}-rev0.{ext}"
-    filepath = os.path.join("outputs", filename)
+    filepath = os.path.join(output_dir, filename)
     
     # Write file
     with open(filepath, 'w', encoding='utf-8') as f:
@@ -471,6 +709,83 @@ def save_output(content: str, task_name: str, output_format: str) -> str:
     return filepath
 
 
+# ============================================================================
+# CONTENT-ADDRESSED RUN CACHE
+# ============================================================================
+
+RUN_MANIFEST = "run.json"
+
+
+def compute_run_id(spec_path: str, workflow: Dict, model: str) -> str:
+    """
+    Identify a workflow run by hashing all of its inputs.
+    
+    Identical spec bytes + workflow JSON + model always map to the same id,
+    so a completed run can be reused instead of re-executed.
+    
+    Args:
+        spec_path: Path to the project specification file
+        workflow: Workflow JSON dict
+        model: Model identifier
+    
+    Returns:
+        16-character hex run id
+    """
+    digest = hashlib.sha256()
+    
+    with open(spec_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    
+    digest.update(json.dumps(workflow, sort_keys=True).encode('utf-8'))
+    digest.update(model.encode('utf-8'))
+    
+    return digest.hexdigest()[:16]
+
+
+def get_run_dir(run_id: str) -> str:
+    """Directory holding every artifact of a run: outputs/<run_id>."""
+    return os.path.join("outputs", run_id)
+
+
+def save_run_manifest(run_id: str, workflow: Dict, output_files: List[str]) -> str:
+    """
+    Mark a run as complete by writing its manifest.
+    
+    Only runs with a manifest are reused, so partial runs are never served.
+    
+    Returns:
+        Manifest file path
+    """
+    manifest_path = os.path.join(get_run_dir(run_id), RUN_MANIFEST)
+    
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({"workflow": workflow, "output_files": output_files}, f, indent=2)
+    
+    return manifest_path
+
+
+def load_run_manifest(run_id: str) -> Optional[Dict]:
+    """
+    Load a completed run's manifest.
+    
+    Returns:
+        Manifest dict, or None if the run is missing, incomplete or stale
+    """
+    manifest_path = os.path.join(get_run_dir(run_id), RUN_MANIFEST)
+    if not os.path.exists(manifest_path):
+        return None
+    
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    
+    # Outputs deleted by hand invalidate the cached run
+    if not all(os.path.exists(path) for path in manifest['output_files']):
+        return None
+    
+    return manifest
+
+
 # ============================================================================
 # MAIN EXECUTION EXAMPLE
 # ============================================================================
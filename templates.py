@@ -14,6 +14,7 @@ Templates can be used in two modes:
 2. As guidance for AI (suggested task structure)
 """
 
+import re
 from typing import Dict, List
 
 
@@ -586,6 +587,22 @@ Base your analysis and recommendations specifically on the project context provi
     return enhanced_template
 
 
+# Keywords per template, in priority order
+SUGGESTION_KEYWORDS = [
+    ("software_development", ['software', 'application', 'system', 'development', 'api', 'database']),
+    ("marketing_campaign", ['marketing', 'campaign', 'advertising', 'promotion', 'brand']),
+    ("research_project", ['research', 'study', 'analysis', 'hypothesis', 'methodology']),
+    ("event_planning", ['event', 'conference', 'meeting', 'venue', 'attendee']),
+    ("business_strategy", ['strategy', 'business', 'growth', 'market', 'competitive']),
+]
+
+# One precompiled alternation per template: a single scan of the text each
+_SUGGESTION_PATTERNS = [
+    (template_id, re.compile("|".join(re.escape(word) for word in words)))
+    for template_id, words in SUGGESTION_KEYWORDS
+]
+
+
 def suggest_template(project_text: str) -> str:
     """
     Suggest most appropriate template based on project text analysis.
@@ -601,21 +618,49 @@ def suggest_template(project_text: str) -> str:
     """
     text_lower = project_text.lower()
     
-    # Simple keyword-based suggestion
-    if any(word in text_lower for word in ['software', 'application', 'system', 'development', 'api', 'database']):
-        return "software_development"
+    # Simple keyword-based suggestion, first matching template wins
+    for template_id, pattern in _SUGGESTION_PATTERNS:
+        if pattern.search(text_lower):
+            return template_id
+    
+    # Default to software development (most versatile)
+    return "software_development"
+
+
+def suggest_template_for_file(path: str, read_size: int = 1 << 16) -> str:
+    """
+    Suggest a template for a UTF-8 text file without loading it into memory.
+    
+    Gives the same answer as suggest_template() on the whole file, but reads
+    it in blocks and stops as soon as the highest-priority template matches.
     
-    elif any(word in text_lower for word in ['marketing', 'campaign', 'advertising', 'promotion', 'brand']):
-        return "marketing_campaign"
+    Args:
+        path: Path to the project specification file
+        read_size: Characters read per block
     
-    elif any(word in text_lower for word in ['research', 'study', 'analysis', 'hypothesis', 'methodology']):
-        return "research_project"
+    Returns:
+        Suggested template ID
+    """
+    # Carry enough of each block over to catch keywords split across blocks
+    overlap = max(len(word) for _, words in SUGGESTION_KEYWORDS for word in words) - 1
     
-    elif any(word in text_lower for word in ['event', 'conference', 'meeting', 'venue', 'attendee']):
-        return "event_planning"
+    matched = set()
+    tail = ""
+    with open(path, 'r', encoding='utf-8') as f:
+        for block in iter(lambda: f.read(read_size), ''):
+            window = tail + block.lower()
+            for template_id, pattern in _SUGGESTION_PATTERNS:
+                if template_id not in matched and pattern.search(window):
+                    matched.add(template_id)
+            
+            # Nothing later in the file can beat the first template
+            if _SUGGESTION_PATTERNS[0][0] in matched:
+                break
+            tail = window[-overlap:]
     
-    elif any(word in text_lower for word in ['strategy', 'business', 'growth', 'market', 'competitive']):
-        return "business_strategy"
+    for template_id, _ in _SUGGESTION_PATTERNS:
+        if template_id in matched:
+            return template_id
     
     # Default to software development (most versatile)
     return "software_development"